@@ -0,0 +1,190 @@
+# Offline batch mode - turns a directory of PDFs into a JSONL question bank, without the web server
+#
+# Usage: python batch.py <pdf directory> <output.jsonl> [--count 20] [--difficulty Medium] [--provider gemini] ...
+# Run it again with the same output file to continue where it stopped; finished PDFs are skipped.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from disk_cache import hash_bytes
+from pipeline import run_stages
+import main as app  # the pipeline functions of the web app
+
+def find_pdfs(directory, recursive=False):
+    if not recursive:
+        names = (name for name in os.listdir(directory) if name.lower().endswith(".pdf"))
+        return sorted(os.path.join(directory, name) for name in names)
+    paths = []
+    for root, _, names in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in names if name.lower().endswith(".pdf"))
+    return sorted(paths)
+
+def finished_documents(output_path):
+    # content hashes of the PDFs that already have a successful line in the output
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash, that document is simply done again
+            if record.get("status") == "ok":
+                done.add(record["sha256"])
+    return done
+
+def end_partial_line(path):
+    # a line cut short by a crash must not swallow the first record of this run
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+def extract(path):
+    # runs in the extraction pool; the extraction cache is on disk, so it is shared with the web app
+    start = time.time()
+    with open(path, "rb") as f:
+        text, method, page_methods = app.extract_text_from_pdf(f)
+    return text, method, page_methods, time.time() - start
+
+def load_topics(topics):
+    try:
+        return json.loads(topics)
+    except (TypeError, ValueError):
+        return topics
+
+def generate(text, options):
+    """
+        Topics, summary and MCQs for one document, with the same functions the web app uses
+
+        Input:
+        text - extracted text
+        options - dict with count, difficulty, topic, provider, mcqType, use_cache, summary, topics
+
+        Output:
+        dict with topics, summary, mcqs and timing (seconds per stage)
+    """
+    use_cache = options["use_cache"]
+    stages = {
+        "mcq": (lambda: app.generate_mcqs(text, count=options["count"], difficulty=options["difficulty"], topic=options["topic"],
+                                          provider=options["provider"], mcqType=options["mcqType"], use_cache=use_cache), []),
+    }
+    if options["summary"]:
+        stages["summary"] = (lambda: app.summary(text, use_cache), [])
+    if options["topics"]:
+        stages["topics"] = (lambda: app.topic_extraction(text, use_cache), [])
+    results, timing = run_stages(stages)
+    return {
+        "topics": load_topics(results["topics"]) if "topics" in results else None,
+        "summary": results.get("summary"),
+        "mcqs": json.loads(results["mcq"]),
+        "timing": {name: round(seconds, 3) for name, seconds in timing["stages"].items()},
+    }
+
+def run(args):
+    pdfs = find_pdfs(args.input, args.recursive)
+    done = finished_documents(args.output)
+    pending = []
+    for path in pdfs:
+        sha256 = file_hash(path)
+        if sha256 in done:
+            continue
+        done.add(sha256)  # the same PDF twice in the directory is only processed once
+        pending.append((path, sha256))
+    print(f"[INFO] {len(pdfs)} PDFs found, {len(pdfs) - len(pending)} already done, {len(pending)} to process.")
+    if not pending:
+        return 0
+
+    options = {
+        "count": args.count,
+        "difficulty": args.difficulty,
+        "topic": args.topic,
+        "provider": args.provider,
+        "mcqType": args.mcq_type,
+        "use_cache": not args.no_cache,
+        "summary": not args.no_summary,
+        "topics": args.topics,
+    }
+
+    # every extraction process gets its share of the OCR workers instead of one pool per core each
+    os.environ["OCR_WORKERS"] = str(max(1, (os.cpu_count() or 1) // args.workers))
+    # spawn, because this process already runs threads that a fork would copy in an unknown state
+    context = multiprocessing.get_context("spawn")
+
+    failed = 0
+    end_partial_line(args.output)
+    with open(args.output, "a", encoding="utf-8") as output, \
+            ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as extractors, \
+            ThreadPoolExecutor(max_workers=args.provider_workers) as generators:
+
+        def process(path, sha256, extraction):
+            text, method, page_methods, extract_time = extraction
+            if not text.strip():
+                raise ValueError("No text extracted from PDF")
+            record = generate(text, options)
+            record["timing"]["extraction"] = round(extract_time, 3)
+            return {"file": os.path.relpath(path, args.input), "sha256": sha256, "status": "ok",
+                    "extraction_method": method, "page_methods": page_methods, **record}
+
+        def write(record):
+            # one line per document, flushed right away so an interrupted run loses nothing that finished
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+
+        running = {extractors.submit(extract, path): ("extract", path, sha256) for path, sha256 in pending}
+        finished = 0
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, path, sha256 = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    finished += 1
+                    print(f"[WARN] {finished}/{len(pending)} {path} failed: {e}")
+                    write({"file": os.path.relpath(path, args.input), "sha256": sha256, "status": "error", "error": str(e)})
+                    continue
+                if stage == "extract":
+                    # documents go to the provider pool as soon as their text is ready
+                    running[generators.submit(process, path, sha256, result)] = ("generate", path, sha256)
+                else:
+                    finished += 1
+                    print(f"[INFO] {finished}/{len(pending)} {path}: {len(result['mcqs'])} MCQs")
+                    write(result)
+
+    print(f"[INFO] Done, {len(pending) - failed} written, {failed} failed (retried on the next run).")
+    return 1 if failed else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate MCQs (and summaries) for every PDF in a directory.")
+    parser.add_argument("input", help="directory with PDF files")
+    parser.add_argument("output", help="JSONL file, appended to; PDFs already in it are skipped")
+    parser.add_argument("--recursive", action="store_true", help="also look in subdirectories")
+    parser.add_argument("--count", type=int, default=20, help="MCQs per PDF")
+    parser.add_argument("--difficulty", default="Medium")
+    parser.add_argument("--topic", default="All", help="comma separated topics, or All")
+    parser.add_argument("--provider", default="gemini", help="gemini, ollama_mistral or auto")
+    parser.add_argument("--mcq-type", default="mcq", help="mcq, fib, trueFalse, ...")
+    parser.add_argument("--topics", action="store_true", help="also extract the topic list of every PDF")
+    parser.add_argument("--no-summary", action="store_true", help="skip the summaries")
+    parser.add_argument("--no-cache", action="store_true", help="do not reuse cached provider responses")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="processes extracting text (and OCR'ing) at the same time")
+    parser.add_argument("--provider-workers", type=int, default=4, help="PDFs being sent to the provider at the same time")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
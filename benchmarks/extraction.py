@@ -0,0 +1,193 @@
+# Extraction micro-benchmarks - pages/sec and peak memory of the pypdf and OCR paths, as JSON
+#
+# Usage (from the repository root):
+#   python -m benchmarks.extraction                       print results
+#   python -m benchmarks.extraction --output base.json    save them
+#   python -m benchmarks.extraction --baseline base.json  also compare, exit code 1 on a regression
+#
+# The text PDFs are generated, the scanned ones are built from ncert-1.png, so nothing but that
+# image has to be committed. OCR cases are skipped (and reported as such) without tesseract and poppler.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+SCAN_FIXTURE = os.path.join(ROOT, "ncert-1.png")
+
+# the app's caches must not answer for the code being measured
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="extraction-bench-")
+
+import pypdf
+import text_extraction
+
+TEXT_PAGES = [1, 10, 50]
+SCAN_PAGES = [1, 4]
+WORDS = ("photosynthesis chlorophyll energy sunlight carbon dioxide oxygen glucose leaf stomata water "
+         "root cell nucleus membrane respiration enzyme protein plant animal soil nutrient").split()
+
+def ocr_available():
+    return bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+
+def text_pdf(pages, seed=0):
+    # deterministic pages of body text, about 2500 characters each
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for number in range(pages):
+        y = 800
+        pdf.drawString(50, y, f"Chapter {number + 1}")
+        for _ in range(45):
+            y -= 16
+            pdf.drawString(50, y, " ".join(rng.choice(WORDS) for _ in range(10)))
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def scanned_pdf(pages):
+    # image-only pages, the same NCERT scan on every page
+    from PIL import Image
+    image = Image.open(SCAN_FIXTURE).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PDF", save_all=True, append_images=[image] * (pages - 1), resolution=200)
+    return buffer.getvalue()
+
+def hybrid_pdf(pages):
+    # every other page scanned, so extract_pages has to combine both paths
+    writer = pypdf.PdfWriter()
+    text = pypdf.PdfReader(io.BytesIO(text_pdf(pages)))
+    scan = pypdf.PdfReader(io.BytesIO(scanned_pdf(1)))
+    for number in range(pages):
+        writer.add_page(scan.pages[0] if number % 2 else text.pages[number])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def measure(function, pages, repeat):
+    """
+        Time function over repeat runs, then run it once more under tracemalloc for the memory peak
+
+        Output:
+        dict with median/min seconds, pages per second and peak Python memory in MB
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    # measured separately, tracemalloc slows allocations down a lot
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "pages": pages,
+        "runs": repeat,
+        "median_seconds": round(median, 4),
+        "min_seconds": round(min(times), 4),
+        "pages_per_second": round(pages / median, 2) if median > 0 else None,
+        "peak_python_mb": round(peak / 1024 / 1024, 2),
+    }
+
+def cases(repeat, ocr_repeat):
+    # (name, path, function, pages, repeat), the PDFs are built before timing starts
+    import main as app  # imported late, after CACHE_DIR points to the throwaway directory
+
+    for pages in TEXT_PAGES:
+        data = text_pdf(pages)
+        yield f"extract_pages/text/{pages}", "pypdf", lambda data=data: text_extraction.extract_pages(data), pages, repeat
+        yield f"extract_text/text/{pages}", "pypdf", lambda data=data: text_extraction.extract_text(data), pages, repeat
+        # cold: every run sees new bytes, warm: the extraction cache answers
+        yield (f"extract_text_from_pdf/cold/{pages}", "pypdf",
+               lambda data=data: app.extract_text_from_pdf(io.BytesIO(data + os.urandom(16))), pages, repeat)
+        app.extract_text_from_pdf(io.BytesIO(data))
+        yield (f"extract_text_from_pdf/warm/{pages}", "cache",
+               lambda data=data: app.extract_text_from_pdf(io.BytesIO(data)), pages, repeat)
+
+    for pages in SCAN_PAGES:
+        data = scanned_pdf(pages)
+        yield f"extract_pages/scanned/{pages}", "ocr", lambda data=data: text_extraction.extract_pages(data), pages, ocr_repeat
+    data = hybrid_pdf(4)
+    yield "extract_pages/hybrid/4", "hybrid", lambda data=data: text_extraction.extract_pages(data), 4, ocr_repeat
+
+def run(repeat, ocr_repeat, only=None):
+    results = {}
+    with_ocr = ocr_available()
+    for name, path, function, pages, runs in cases(repeat, ocr_repeat):
+        if only and only not in name:
+            continue
+        if path in ("ocr", "hybrid") and not with_ocr:
+            results[name] = {"path": path, "skipped": "tesseract or poppler not installed"}
+            continue
+        print(f"[INFO] {name}", file=sys.stderr)
+        results[name] = {"path": path, **measure(function, pages, runs)}
+    return {
+        "benchmark": "extraction",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pypdf": pypdf.__version__,
+            "ocr_available": with_ocr,
+            "ocr_workers": int(os.getenv("OCR_WORKERS", os.cpu_count() or 1)),
+        },
+        "results": results,
+    }
+
+def compare(current, baseline, tolerance):
+    # cases that got slower (or hungrier) than the baseline by more than tolerance
+    regressions = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or "skipped" in result or "skipped" in before:
+            continue
+        for metric in ("median_seconds", "peak_python_mb"):
+            if before[metric] and result[metric] > before[metric] * (1 + tolerance):
+                regressions.append({"case": name, "metric": metric, "baseline": before[metric], "current": result[metric]})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction.")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per pypdf case")
+    parser.add_argument("--ocr-repeat", type=int, default=2, help="timed runs per OCR case")
+    parser.add_argument("--only", help="run only the cases whose name contains this")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--baseline", help="earlier output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    # the app and the extraction code print progress, stdout is kept for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args.repeat, args.ocr_repeat, args.only)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    shutil.rmtree(os.environ["CACHE_DIR"], ignore_errors=True)
+    return 1 if report.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+# End-to-end load test - virtual teachers go through the two-step "/" flow and the downloads
+# at the same time, against a stub LLM server, so no API keys are needed
+#
+# Usage (from the repository root):
+#   python -m benchmarks.load_test --users 8 --iterations 3             starts the stub and app.py itself
+#   python -m benchmarks.load_test --users 8 --duration 120 --latency 2 slower stub, fixed duration
+#   python -m benchmarks.load_test --target http://127.0.0.1:5000       an app that is already running
+#
+# Prints p50/p95/p99 latency and throughput per stage as JSON (--output to save it).
+# With --target the app must already point at a stub: OLLAMA_URL, GEMINI_API_ENDPOINT and GEMINI_API_KEY.
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["page", "topics", "generate", "download_pdf", "download_txt"]
+WORDS = ("photosynthesis chlorophyll energy sunlight carbon dioxide oxygen glucose leaf stomata water "
+         "root cell nucleus membrane respiration enzyme protein plant animal soil nutrient").split()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_until_up(url, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before it was ready")
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def make_pdf(seed, pages):
+    # a small text PDF; every user gets its own, so the extraction cache does not answer for everyone
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for number in range(pages):
+        y = 800
+        pdf.drawString(50, y, f"Chapter {number + 1} ({seed})")
+        for _ in range(40):
+            y -= 18
+            pdf.drawString(50, y, " ".join(rng.choice(WORDS) for _ in range(10)))
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+class Recorder:
+    # latency samples and errors per stage, shared by all virtual users
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+        self.errors = {stage: 0 for stage in STAGES}
+        self.error_examples = {}
+        self.flows = 0
+
+    def timed(self, stage, call):
+        start = time.perf_counter()
+        try:
+            response = call()
+            if response.status_code >= 400:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        except Exception as e:
+            with self.lock:
+                self.errors[stage] += 1
+                self.error_examples.setdefault(stage, str(e))
+            return None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.samples[stage].append(elapsed)
+        return response
+
+    def flow_done(self):
+        with self.lock:
+            self.flows += 1
+
+def percentile(values, share):
+    # nearest-rank percentile of a sorted list
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, math.ceil(share * len(values)) - 1))
+    return values[index]
+
+def user_flow(base, recorder, pdf, options):
+    """
+        One teacher: open the page, upload for topics, upload again to generate, download both files
+
+        Input:
+        base - app URL
+        recorder - Recorder for the timings
+        pdf - bytes of the PDF to upload
+        options - form fields of the generate step
+
+        Output:
+        True if every stage succeeded
+    """
+    session = requests.Session()  # keeps the sid cookie, like a browser tab
+    timeout = options["timeout"]
+    form = options["form"]
+
+    if recorder.timed("page", lambda: session.get(base + "/", timeout=timeout)) is None:
+        return False
+    files = lambda: {"pdf_file": ("chapter.pdf", pdf, "application/pdf")}
+    if recorder.timed("topics", lambda: session.post(base + "/", data={**form, "topicsExtracted": "false"},
+                                                     files=files(), timeout=timeout)) is None:
+        return False
+    response = recorder.timed("generate", lambda: session.post(base + "/", data={**form, "topicsExtracted": "true"},
+                                                               files=files(), timeout=timeout))
+    if response is None:
+        return False
+    result_id = response.json().get("result_id")
+    for kind in ("pdf", "txt"):
+        if recorder.timed(f"download_{kind}", lambda: session.get(f"{base}/download/{kind}", params={"result_id": result_id},
+                                                                   timeout=timeout)) is None:
+            return False
+    recorder.flow_done()
+    return True
+
+def run_users(base, args):
+    recorder = Recorder()
+    form = {
+        "question_count": str(args.count),
+        "difficulty": "Medium",
+        "topic": "All",
+        "provider": args.provider,
+        "no_cache": "false" if args.cache else "true",
+    }
+    options = {"form": form, "timeout": args.timeout}
+    pdfs = [make_pdf(f"user-{number}-{time.time()}", args.pages) for number in range(args.users)]
+    deadline = time.time() + args.duration if args.duration else None
+
+    def virtual_user(number):
+        time.sleep(random.uniform(0, args.ramp_up))  # not everybody clicks in the same millisecond
+        iteration = 0
+        while True:
+            if deadline is None and iteration >= args.iterations:
+                break
+            if deadline is not None and time.time() >= deadline:
+                break
+            user_flow(base, recorder, pdfs[number], options)
+            iteration += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=virtual_user, args=(number,), daemon=True) for number in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - start
+
+def summarize(recorder, elapsed):
+    stages = {}
+    for stage in STAGES:
+        values = sorted(recorder.samples[stage])
+        stages[stage] = {
+            "count": len(values),
+            "errors": recorder.errors[stage],
+            "p50_seconds": round(percentile(values, 0.50), 4) if values else None,
+            "p95_seconds": round(percentile(values, 0.95), 4) if values else None,
+            "p99_seconds": round(percentile(values, 0.99), 4) if values else None,
+            "mean_seconds": round(sum(values) / len(values), 4) if values else None,
+            "max_seconds": round(values[-1], 4) if values else None,
+            "per_second": round(len(values) / elapsed, 3) if elapsed > 0 else None,
+        }
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "flows": recorder.flows,
+        "flows_per_second": round(recorder.flows / elapsed, 3) if elapsed > 0 else None,
+        "stages": stages,
+        "error_examples": recorder.error_examples,
+    }
+
+def start_processes(args, workdir):
+    # stub LLM server and app, each on a free port; their output goes to log files in workdir
+    stub_port, app_port = free_port(), free_port()
+    stub_url, base = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_llm", "--port", str(stub_port), "--latency", str(args.latency),
+         "--jitter", str(args.jitter), "--tokens-per-second", str(args.tokens_per_second), "--error-rate", str(args.error_rate)],
+        cwd=ROOT, stdout=open(os.path.join(workdir, "stub.log"), "w"), stderr=subprocess.STDOUT)
+    env = {
+        **os.environ,
+        "OLLAMA_URL": stub_url,
+        "GEMINI_API_ENDPOINT": stub_url,
+        "GEMINI_API_KEY": "stub",
+        "CACHE_DIR": os.path.join(workdir, "cache"),  # a fresh cache, earlier runs must not answer
+        "PYTHONUNBUFFERED": "1",
+    }
+    app = subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", args.app, "run", "--port", str(app_port), "--with-threads", "--no-reload"],
+        cwd=ROOT, env=env, stdout=open(os.path.join(workdir, "app.log"), "w"), stderr=subprocess.STDOUT)
+    try:
+        wait_until_up(stub_url + "/api/tags", stub, 30)
+        wait_until_up(base + "/startup", app, args.startup_timeout)
+    except Exception:
+        stop_processes([stub, app])
+        raise
+    return base, stub_url, [stub, app]
+
+def stop_processes(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the two-step generation flow and the downloads.")
+    parser.add_argument("--target", help="URL of a running app; by default the stub and the app are started here")
+    parser.add_argument("--app", default="app", help="module to start when there is no --target: app or main")
+    parser.add_argument("--users", type=int, default=4, help="virtual users running at the same time")
+    parser.add_argument("--iterations", type=int, default=2, help="flows per user (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of a fixed number of flows")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="users start at random within this many seconds")
+    parser.add_argument("--pages", type=int, default=3, help="pages of every uploaded PDF")
+    parser.add_argument("--count", type=int, default=10, help="MCQs asked for per flow")
+    parser.add_argument("--provider", default="gemini", help="gemini, ollama_mistral or auto")
+    parser.add_argument("--cache", action="store_true", help="let the app reuse cached provider responses")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds a single request may take")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub: seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.2, help="stub: random extra latency, as a fraction of --latency")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="stub: generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub: share of calls answered with 503")
+    parser.add_argument("--startup-timeout", type=float, default=120, help="seconds the app may take to load its models")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    processes = []
+    stub_url = None
+    report = None
+    try:
+        if args.target:
+            base = args.target.rstrip("/")
+            wait_until_up(base + "/startup", None, args.startup_timeout)
+        else:
+            base, stub_url, processes = start_processes(args, workdir)
+        print(f"[INFO] {args.users} users against {base}", file=sys.stderr)
+        recorder, elapsed = run_users(base, args)
+        report = {
+            "benchmark": "load_test",
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "settings": {key: value for key, value in vars(args).items() if key != "output"},
+            **summarize(recorder, elapsed),
+        }
+        if stub_url:
+            report["stub_calls"] = requests.get(stub_url + "/stats", timeout=5).json()
+    finally:
+        stop_processes(processes)
+        if processes and (report is None or report["error_examples"]):
+            print(f"[WARN] Errors occurred, the app and stub logs are kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report["error_examples"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+# Stand-in for Ollama and Gemini - answers the app's prompts with canned output at a configurable speed
+#
+# Usage: python -m benchmarks.stub_llm --port 8765 --latency 0.5 --tokens-per-second 80
+# Then start the app with OLLAMA_URL=http://127.0.0.1:8765 GEMINI_API_ENDPOINT=http://127.0.0.1:8765 GEMINI_API_KEY=stub
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+GEMINI_PATH = re.compile(r"^/v1beta/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)")
+BATCH_SIZE = re.compile(r"Create (\d+) ")
+
+class Settings:
+    latency = 0.5  # seconds before the first token
+    jitter = 0.2  # up to this fraction of latency is added at random
+    tokens_per_second = 80.0
+    error_rate = 0.0  # share of calls answered with a 503
+    chunk_tokens = 20  # tokens per streamed piece
+
+counters = {"ollama": 0, "gemini": 0, "errors": 0}
+counters_lock = threading.Lock()
+
+def answer(prompt):
+    # canned output shaped like what the app asks for
+    if "educational themes" in prompt:
+        return json.dumps(["Photosynthesis", "Chlorophyll", "Respiration", "Plant Cells", "Stomata"])
+    if "bullet point notes" in prompt:
+        return "\n".join(f"- Key fact {number} from this part of the document." for number in range(1, 11))
+    if "summary" in prompt.lower() and "multiple choice" not in prompt.lower():
+        return "# Summary\n\n" + "\n".join(f"- Important point {number} of the chapter." for number in range(1, 16))
+    match = BATCH_SIZE.search(prompt)
+    count = int(match.group(1)) if match else 5
+    salt = random.randrange(10 ** 9)  # every batch gets distinct questions, so de-duplication keeps them
+    return json.dumps([{
+        "question": f"Stub question {salt}-{number}: which process makes food in green plants?",
+        "options": ["Photosynthesis", "Respiration", "Transpiration", "Digestion"],
+        "correctAnswer": 0,
+        "explanation": "Green plants make food from sunlight, water and carbon dioxide by photosynthesis.",
+        "topic": "Photosynthesis",
+    } for number in range(count)], indent=1)
+
+def pieces(text):
+    size = Settings.chunk_tokens * CHARS_PER_TOKEN
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+def generation_time(text):
+    return len(text) / CHARS_PER_TOKEN / Settings.tokens_per_second
+
+def first_token_delay():
+    return Settings.latency * (1 + random.uniform(0, Settings.jitter))
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # one line per call would drown the load test output
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_chunked(self, content_type, parts):
+        # parts is an iterable of strings, written as they are produced
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for part in parts:
+            data = part.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def fail(self):
+        with counters_lock:
+            counters["errors"] += 1
+        self.send_json(503, {"error": "stub overloaded"})
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self.send_json(200, {"models": [{"name": "mistral:latest"}]})
+        elif self.path == "/stats":
+            with counters_lock:
+                self.send_json(200, dict(counters))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.read_json()
+        if self.path == "/api/generate":
+            self.ollama(body)
+            return
+        match = GEMINI_PATH.match(self.path)
+        if match:
+            self.gemini(body, match.group("model"), match.group("method") == "streamGenerateContent")
+            return
+        self.send_json(404, {"error": "not found"})
+
+    def ollama(self, body):
+        with counters_lock:
+            counters["ollama"] += 1
+        if random.random() < Settings.error_rate:
+            self.fail()
+            return
+        text = answer(body.get("prompt", ""))
+        time.sleep(first_token_delay())
+        if not body.get("stream", True):
+            time.sleep(generation_time(text))
+            self.send_json(200, {"model": body.get("model"), "response": text, "done": True,
+                                 "total_duration": 0, "eval_count": len(text) // CHARS_PER_TOKEN})
+            return
+
+        def lines():
+            for piece in pieces(text):
+                time.sleep(generation_time(piece))
+                yield json.dumps({"model": body.get("model"), "response": piece, "done": False}) + "\n"
+            yield json.dumps({"model": body.get("model"), "response": "", "done": True}) + "\n"
+        self.send_chunked("application/x-ndjson", lines())
+
+    def gemini(self, body, model, stream):
+        with counters_lock:
+            counters["gemini"] += 1
+        if random.random() < Settings.error_rate:
+            self.fail()
+            return
+        prompt = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        text = answer(prompt)
+
+        def response(piece, finished):
+            candidate = {"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}
+            if finished:
+                candidate["finishReason"] = "STOP"
+            return {"candidates": [candidate], "modelVersion": model,
+                    "usageMetadata": {"promptTokenCount": len(prompt) // CHARS_PER_TOKEN,
+                                      "candidatesTokenCount": len(text) // CHARS_PER_TOKEN}}
+
+        time.sleep(first_token_delay())
+        if not stream:
+            time.sleep(generation_time(text))
+            self.send_json(200, response(text, True))
+            return
+
+        # the REST transport of the SDK reads a streamed JSON array
+        def array():
+            parts = pieces(text)
+            yield "["
+            for number, piece in enumerate(parts):
+                time.sleep(generation_time(piece))
+                yield ("," if number else "") + json.dumps(response(piece, number == len(parts) - 1))
+            yield "]"
+        self.send_chunked("application/json", array())
+
+def serve(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama/Gemini server for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=Settings.latency, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=Settings.jitter, help="random extra latency, as a fraction of --latency")
+    parser.add_argument("--tokens-per-second", type=float, default=Settings.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=Settings.error_rate, help="share of calls answered with 503")
+    args = parser.parse_args()
+
+    Settings.latency = args.latency
+    Settings.jitter = args.jitter
+    Settings.tokens_per_second = args.tokens_per_second
+    Settings.error_rate = args.error_rate
+    server = serve(args.port, args.host)
+    print(f"[INFO] Stub LLM server on http://{args.host}:{args.port}", flush=True)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Local BM25 index over a document's chunks - topic filtered prompts only carry the chunks about those topics
+
+import os
+import re
+import threading
+import numpy as np
+from cachetools import LRUCache
+from disk_cache import hash_bytes
+from text_extraction import split_chunks
+
+INDEX_CHUNK_CHARS = int(os.getenv("INDEX_CHUNK_CHARS", 2000))  # size of the indexed chunks
+TOPIC_TOP_K = int(os.getenv("TOPIC_TOP_K", 8))  # chunks sent to the provider for the selected topics
+
+TOKEN = re.compile(r"[\w\u0900-\u097F]+")  # whole Devanagari words, including vowel signs
+K1 = 1.5
+B = 0.75
+
+indexes = LRUCache(maxsize=int(os.getenv("INDEX_CACHE_SIZE", 32)))  # text hash -> ChunkIndex
+indexes_lock = threading.Lock()
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+class ChunkIndex:
+    """
+        BM25 over chunks of one document. Postings are stored per term as numpy arrays,
+        so a query only touches the chunks that contain its terms
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.vocabulary = {}
+        chunk_ids, term_ids, counts = [], [], []
+        lengths = []
+        for number, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            lengths.append(len(tokens))
+            ids = np.fromiter((self.vocabulary.setdefault(token, len(self.vocabulary)) for token in tokens),
+                              dtype=np.int64, count=len(tokens))
+            terms, term_counts = np.unique(ids, return_counts=True)
+            chunk_ids.append(np.full(len(terms), number, dtype=np.int64))
+            term_ids.append(terms)
+            counts.append(term_counts)
+
+        chunk_ids = np.concatenate(chunk_ids) if chunks else np.zeros(0, dtype=np.int64)
+        term_ids = np.concatenate(term_ids) if chunks else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate(counts) if chunks else np.zeros(0, dtype=np.int64)
+
+        # postings of term t are at offsets[t]:offsets[t + 1]
+        order = np.argsort(term_ids, kind="stable")
+        self.posting_chunks = chunk_ids[order]
+        self.posting_counts = counts[order].astype(np.float64)
+        self.offsets = np.searchsorted(term_ids[order], np.arange(len(self.vocabulary) + 1))
+
+        self.lengths = np.array(lengths, dtype=np.float64)
+        average = self.lengths.mean() if chunks and self.lengths.mean() > 0 else 1.0
+        self.length_norm = K1 * (1 - B + B * self.lengths / average)
+        frequency = np.diff(self.offsets)
+        self.idf = np.log(1 + (len(chunks) - frequency + 0.5) / (frequency + 0.5))
+
+    def scores(self, query):
+        scores = np.zeros(len(self.chunks))
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            postings = slice(self.offsets[term], self.offsets[term + 1])
+            chunks = self.posting_chunks[postings]
+            counts = self.posting_counts[postings]
+            scores[chunks] += self.idf[term] * counts * (K1 + 1) / (counts + self.length_norm[chunks])
+        return scores
+
+    def top_k(self, query, k):
+        # chunk numbers of the best matches, best first, leaving out chunks without any query term
+        scores = self.scores(query)
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [int(number) for number in best if scores[number] > 0]
+
+def get_index(text):
+    # the index is built once per document and reused by every batch and request
+    key = hash_bytes(text.encode("utf-8"))
+    with indexes_lock:
+        index = indexes.get(key)
+    if index is None:
+        index = ChunkIndex(split_chunks(text, INDEX_CHUNK_CHARS))
+        with indexes_lock:
+            indexes[key] = index
+    return index
+
+def relevant_text(text, topic):
+    """
+        Keep only the parts of the document that are about the selected topics
+
+        Input:
+        text - document text
+        topic - "All" or comma separated topics, as sent by the frontend
+
+        Output:
+        text - the best matching chunks in document order, or the whole text if it is already
+               short, no topic was selected or nothing matched
+    """
+    topics = [t.strip() for t in topic.split(",") if t.strip() and t.strip() != "All"]
+    if not topics or len(text) <= TOPIC_TOP_K * INDEX_CHUNK_CHARS:
+        return text
+
+    index = get_index(text)
+    rankings = [index.top_k(name, TOPIC_TOP_K) for name in topics]
+    # the best chunk of every topic in turn, so each topic is covered before one gets a second chunk,
+    # until TOPIC_TOP_K chunks are selected in total
+    selected = set()
+    for rank in range(TOPIC_TOP_K):
+        for ranking in rankings:
+            if len(selected) < TOPIC_TOP_K and rank < len(ranking):
+                selected.add(ranking[rank])
+    if not selected:
+        return text
+
+    print(f"[INFO] Using {len(selected)} of {len(index.chunks)} chunks for topics: {', '.join(topics)}")
+    return "\n\n".join(index.chunks[number] for number in sorted(selected))
@@ -0,0 +1,83 @@
+# Small on-disk cache for JSON values, shared by every worker process on the machine
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+CACHE_ROOT = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(__file__), ".cache"))
+
+def hash_bytes(data):
+    """
+        Content address used as cache key
+
+        Input:
+        data - bytes
+
+        Output:
+        hex digest - string
+    """
+    return hashlib.sha256(data).hexdigest()
+
+class DiskCache:
+    """
+        Stores one JSON file per key under CACHE_ROOT/<name>.
+        Reads refresh the file's mtime, so evicting the oldest mtimes first gives LRU order.
+        Total size on disk is kept under max_bytes.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.directory = os.path.join(CACHE_ROOT, name)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # mark as recently used
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value):
+        # write to a temp file first so other processes never read a half-written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path(key))
+        except OSError as e:
+            print(f"[WARN] Could not write cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # removed by another process
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                total -= size
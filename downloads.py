@@ -0,0 +1,133 @@
+# Rendered PDF/TXT downloads - built in memory, cached by content hash and served with an ETag
+
+import io
+import json
+import os
+import threading
+from cachetools import LRUCache
+from flask import send_file
+from disk_cache import hash_bytes
+import metrics
+
+DOWNLOAD_CACHE_MB = int(os.getenv("DOWNLOAD_CACHE_MB", 64))  # memory used by rendered downloads
+
+# content hash -> rendered bytes, bounded by total size
+artifacts = LRUCache(maxsize=DOWNLOAD_CACHE_MB * 1024 * 1024, getsizeof=len)
+artifacts_lock = threading.Lock()
+
+RENDER_SECONDS = metrics.histogram("download_render_seconds", "Time to render a download", ["kind"])
+REQUESTS = metrics.counter("download_requests_total", "Downloads, by whether the rendered file was cached", ["kind", "cache"])
+
+def load_mcqs(mcqs):
+    try:
+        return json.loads(mcqs)
+    except (TypeError, ValueError):
+        return []
+
+def render_pdf(summary, mcqs):
+    # reportlab is only needed here, so it is imported on the first download
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    mcq_list = load_mcqs(mcqs)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer)
+    styles = getSampleStyleSheet()
+
+    # Custom styles
+    question_style = ParagraphStyle('QuestionStyle', parent=styles['BodyText'], spaceAfter=6, fontSize=11, leading=14)
+    answer_style = ParagraphStyle('AnswerStyle', parent=styles['BodyText'], textColor=colors.green, spaceAfter=12)
+    heading_style = ParagraphStyle('HeadingStyle', parent=styles['Heading1'], spaceAfter=12)
+
+    elements = []
+
+    # Summary
+    elements.append(Paragraph("📄 Summary", heading_style))
+    elements.append(Paragraph(summary, styles['BodyText']))
+    elements.append(Spacer(1, 15))
+
+    # MCQs
+    elements.append(Paragraph("📝 Multiple Choice Questions", heading_style))
+    for i, mcq in enumerate(mcq_list, start=1):
+        elements.append(Paragraph(f"{i}. {mcq['question']}", question_style))
+
+        # Bullet list for options
+        option_items = [
+            ListItem(Paragraph(f"{chr(65+idx)}. {opt}", styles['BodyText']), bulletColor=colors.black)
+            for idx, opt in enumerate(mcq['options'])
+        ]
+        elements.append(ListFlowable(option_items, bulletType='bullet', start='circle'))
+
+        # Correct Answer
+        correct_opt = f"{chr(65+mcq['correctAnswer'])}. {mcq['options'][mcq['correctAnswer']]}"
+        elements.append(Paragraph(f"✅ Correct Answer: <b>{correct_opt}</b>", answer_style))
+
+        # Explanation
+        elements.append(Paragraph(f"ℹ {mcq['explanation']}", styles['BodyText']))
+        elements.append(Spacer(1, 12))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+def render_txt(summary, mcqs):
+    # Remove HTML from summary
+    from bs4 import BeautifulSoup
+    clean_summary = BeautifulSoup(summary, "html.parser").get_text()
+
+    lines = ["📄 Summary", clean_summary, "", "📝 Multiple Choice Questions"]
+    for i, mcq in enumerate(load_mcqs(mcqs), start=1):
+        lines.append(f"{i}. {mcq['question']}")
+        for idx, opt in enumerate(mcq['options']):
+            lines.append(f"   {chr(65+idx)}. {opt}")
+        lines.append(f"✅ Correct Answer: {chr(65+mcq['correctAnswer'])}. {mcq['options'][mcq['correctAnswer']]}")
+        lines.append(f"ℹ Explanation: {mcq['explanation']}")
+        lines.append("")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+RENDERERS = {
+    "pdf": (render_pdf, "application/pdf"),
+    "txt": (render_txt, "text/plain; charset=utf-8"),
+}
+
+def artifact(kind, summary, mcqs):
+    """
+        Rendered download, from the cache if the same quiz was rendered before
+
+        Input:
+        kind - "pdf" or "txt"
+        summary - summary HTML
+        mcqs - JSON string of the MCQ list
+
+        Output:
+        data - bytes
+        etag - content hash of the inputs, also the cache key
+    """
+    etag = hash_bytes(json.dumps([kind, summary, mcqs]).encode("utf-8"))
+    with artifacts_lock:
+        data = artifacts.get(etag)
+    REQUESTS.inc(kind=kind, cache="miss" if data is None else "hit")
+    if data is None:
+        render, _ = RENDERERS[kind]
+        with RENDER_SECONDS.time(kind=kind):
+            data = render(summary, mcqs)
+        with artifacts_lock:
+            artifacts[etag] = data
+    return data, etag
+
+def send(kind, summary, mcqs):
+    """
+        Flask response for a download. Browsers that already have it (If-None-Match) get a 304
+
+        Input:
+        kind - "pdf" or "txt"
+        summary, mcqs - as for artifact
+
+        Output:
+        flask.Response
+    """
+    data, etag = artifact(kind, summary, mcqs)
+    _, mimetype = RENDERERS[kind]
+    # send_file answers If-None-Match with 304 on its own (conditional=True)
+    return send_file(io.BytesIO(data), mimetype=mimetype, as_attachment=True,
+                     download_name=f"results.{kind}", etag=etag, conditional=True)
@@ -1,9 +1,6 @@
 # Necessary imports
-from flask import Flask, request, jsonify, render_template, send_file
-import tempfile
-from reportlab.lib import colors  # used for PDF generation
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from flask import Flask, request, jsonify, render_template, g
+import downloads  # renders the PDF/TXT downloads in memory and caches them
 from flask_cors import CORS  # handles cross-origin issues during frontend-backend connection
 from pytesseract import pytesseract  # used for OCR if PDF is image-based
 from dotenv import load_dotenv  # loads environment variables like API keys
@@ -22,16 +19,34 @@ import wave
 from piper import PiperVoice
 from bs4 import BeautifulSoup
 import re
+from result_store import SESSION_COOKIE, RESULT_TTL, new_id, valid_id, get_session, save_result, get_result  # per-session results
 
 STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
 load_dotenv()
 
-latest_summary = ""
-latest_mcqs = ""
-
 app = Flask(__name__, template_folder='templates')
 CORS(app)  # allows requests from other origins (frontend)
 
+# the caller's session id from the cookie; a new session gets its cookie in set_session_cookie
+def session_id():
+    sid = request.cookies.get(SESSION_COOKIE)
+    if valid_id(sid):
+        return sid
+    if "new_session_id" not in g:
+        g.new_session_id = new_id()
+    return g.new_session_id
+
+@app.after_request
+def set_session_cookie(response):
+    if "new_session_id" in g:
+        response.set_cookie(SESSION_COOKIE, g.new_session_id, max_age=RESULT_TTL, httponly=True, samesite="Lax")
+    return response
+
+# the result named by ?result_id=, otherwise the latest result of the caller's session
+def requested_result():
+    result_id = request.args.get('result_id') or get_session(session_id())["result_id"]
+    return get_result(result_id)
+
 # setup Gemini model
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 gemini_model = genai.GenerativeModel('gemini-2.0-flash')
@@ -72,7 +87,6 @@ def generate_with_gemini(prompt):
     
 @app.route('/', methods=['POST', 'GET'])
 def home():
-    global latest_summary, latest_mcqs
     if request.method == 'POST':
         start_time = time.time()
 
@@ -109,11 +123,11 @@ def home():
 
         total_time = time.time() - start_time
 
-        latest_summary = summarized_text
-        latest_mcqs = mcqs
+        result_id = save_result(session_id(), summarized_text, mcqs)
 
         # send final response
         return jsonify({
+            "result_id": result_id,
             "summary": summarized_text,
             "mcqs": mcqs,
             "metadata": {
@@ -135,78 +149,17 @@ def home():
 
 @app.route('/download/pdf', methods=['GET'])
 def download_pdf():
-    if not latest_summary and not latest_mcqs:
+    result = requested_result()
+    if not result:
         return "No data to download", 400
-    
-    try:
-        mcq_list = json.loads(latest_mcqs)
-    except:
-        mcq_list = []
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    doc = SimpleDocTemplate(temp_file.name)
-    styles = getSampleStyleSheet()
-
-    # Custom styles
-    question_style = ParagraphStyle('QuestionStyle', parent=styles['BodyText'], spaceAfter=6, fontSize=11, leading=14)
-    answer_style = ParagraphStyle('AnswerStyle', parent=styles['BodyText'], textColor=colors.green, spaceAfter=12)
-    heading_style = ParagraphStyle('HeadingStyle', parent=styles['Heading1'], spaceAfter=12)
-
-    elements = []
-
-    # Summary
-    elements.append(Paragraph("📄 Summary", heading_style))
-    elements.append(Paragraph(latest_summary, styles['BodyText']))
-    elements.append(Spacer(1, 15))
-
-    # MCQs
-    elements.append(Paragraph("📝 Multiple Choice Questions", heading_style))
-    for i, mcq in enumerate(mcq_list, start=1):
-        elements.append(Paragraph(f"{i}. {mcq['question']}", question_style))
-
-        # Bullet list for options
-        option_items = [
-            ListItem(Paragraph(f"{chr(65+idx)}. {opt}", styles['BodyText']), bulletColor=colors.black)
-            for idx, opt in enumerate(mcq['options'])
-        ]
-        elements.append(ListFlowable(option_items, bulletType='bullet', start='circle'))
-
-        # Correct Answer
-        correct_opt = f"{chr(65+mcq['correctAnswer'])}. {mcq['options'][mcq['correctAnswer']]}"
-        elements.append(Paragraph(f"✅ Correct Answer: <b>{correct_opt}</b>", answer_style))
-
-        # Explanation
-        elements.append(Paragraph(f"ℹ {mcq['explanation']}", styles['BodyText']))
-        elements.append(Spacer(1, 12))
-
-    doc.build(elements)
-    return send_file(temp_file.name, as_attachment=True, download_name="results.pdf")
+    return downloads.send("pdf", result["summary"], result["mcqs"])
 
 @app.route('/download/txt', methods=['GET'])
 def download_txt():
-    if not latest_summary and not latest_mcqs:
+    result = requested_result()
+    if not result:
         return "No data to download", 400
-
-    # Remove HTML from summary
-    clean_summary = BeautifulSoup(latest_summary, "html.parser").get_text()
-
-    try:
-        mcq_list = json.loads(latest_mcqs)
-    except:
-        mcq_list = []
-
-    content = "📄 Summary\n" + clean_summary + "\n\n📝 Multiple Choice Questions\n"
-    for i, mcq in enumerate(mcq_list, start=1):
-        content += f"{i}. {mcq['question']}\n"
-        for idx, opt in enumerate(mcq['options']):
-            content += f"   {chr(65+idx)}. {opt}\n"
-        content += f"✅ Correct Answer: {chr(65+mcq['correctAnswer'])}. {mcq['options'][mcq['correctAnswer']]}\n"
-        content += f"ℹ Explanation: {mcq['explanation']}\n\n"
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".txt", mode='w', encoding='utf-8')
-    temp_file.write(content)
-    temp_file.close()
-    return send_file(temp_file.name, as_attachment=True, download_name="results.txt")
+    return downloads.send("txt", result["summary"], result["mcqs"])
 
 
 # tries to extract text using pypdf, falls back to OCR if text not found
@@ -0,0 +1,128 @@
+# Queued generation jobs - the request returns a job id at once and a bounded pool of workers runs the pipeline
+
+import os
+import queue
+import threading
+import time
+from result_store import open_store, new_id, valid_id
+
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", 2))  # jobs running at the same time
+GENERATION_QUEUE_SIZE = int(os.getenv("GENERATION_QUEUE_SIZE", 16))  # jobs waiting, new ones are refused beyond this
+GENERATION_JOB_ITEMS = int(os.getenv("GENERATION_JOB_ITEMS", 1000))  # job records kept, memory backend only
+
+# job records have their own store, so sessions and results written meanwhile cannot evict a running job
+store = open_store("jobs", GENERATION_JOB_ITEMS)
+
+pending = queue.Queue(maxsize=GENERATION_QUEUE_SIZE)
+jobs_lock = threading.Lock()  # jobs are only updated by the process running them
+workers = []
+
+def job_key(job_id):
+    return f"job:{job_id}"
+
+def start_workers():
+    # workers are started on the first job, so importing the app does not start threads
+    with jobs_lock:
+        while len(workers) < GENERATION_WORKERS:
+            worker = threading.Thread(target=work, name=f"generation-{len(workers)}", daemon=True)
+            worker.start()
+            workers.append(worker)
+
+def submit(task, stages):
+    """
+        Queue a task for the worker pool
+
+        Input:
+        task - function(progress) returning the JSON-serialisable result,
+               progress(stage, status, seconds) reports a stage as "running", "done" or "error"
+        stages - names of the stages the task reports, listed as "pending" until they start
+
+        Output:
+        job id - string, raises queue.Full when GENERATION_QUEUE_SIZE jobs are already waiting
+    """
+    start_workers()
+    job_id = new_id()
+    store.set(job_key(job_id), {
+        "status": "queued",
+        "stages": {name: {"status": "pending", "time": None} for name in stages},
+        "error": None,
+        "result": None,
+        "created": time.time(),
+        "started": None,
+        "finished": None,
+    })
+    try:
+        pending.put_nowait((job_id, task))
+    except queue.Full:
+        store.delete(job_key(job_id))
+        raise
+    return job_id
+
+def update(job_id, change):
+    # read-modify-write of the job record, change is a function that edits the record in place
+    with jobs_lock:
+        job = store.get(job_key(job_id))
+        if job is None:
+            return
+        change(job)
+        store.set(job_key(job_id), job)
+
+def work():
+    while True:
+        job_id, task = pending.get()
+        try:
+            run(job_id, task)
+        finally:
+            pending.task_done()
+
+def run(job_id, task):
+    def started(job):
+        job["status"] = "running"
+        job["started"] = time.time()
+    update(job_id, started)
+
+    def progress(stage, status, seconds=None):
+        def change(job):
+            job["stages"][stage] = {"status": status, "time": round(seconds, 3) if seconds is not None else None}
+        update(job_id, change)
+
+    try:
+        result = task(progress)
+    except Exception as e:
+        print(f"[WARN] Generation job {job_id} failed: {e}")
+        error = str(e)  # e is unbound once the except block ends
+        def failed(job):
+            job["status"] = "error"
+            job["error"] = error
+            job["finished"] = time.time()
+        update(job_id, failed)
+        return
+
+    def finished(job):
+        job["status"] = "done"
+        job["result"] = result
+        job["finished"] = time.time()
+    update(job_id, finished)
+
+def status(job_id):
+    """
+        Input:
+        job_id - string
+
+        Output:
+        job record without its result, None if the job is unknown or has expired
+    """
+    if not valid_id(job_id):
+        return None
+    job = store.get(job_key(job_id))
+    if job is None:
+        return None
+    info = {key: value for key, value in job.items() if key != "result"}
+    info["queue_depth"] = pending.qsize()
+    return info
+
+def result(job_id):
+    # the full job record including its result, None if unknown
+    if not valid_id(job_id):
+        return None
+    return store.get(job_key(job_id))
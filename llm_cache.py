@@ -0,0 +1,122 @@
+# Cache of provider responses - identical prompts to the same model are only sent once
+
+import json
+import os
+import threading
+import time
+from cachetools import TTLCache
+from disk_cache import DiskCache, hash_bytes
+import metrics
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))  # seconds a response stays valid
+
+memory_cache = TTLCache(maxsize=int(os.getenv("LLM_CACHE_ITEMS", 256)), ttl=LLM_CACHE_TTL)
+disk_cache = DiskCache("llm_responses", max_bytes=int(os.getenv("LLM_CACHE_MB", 256)) * 1024 * 1024)
+lock = threading.Lock()
+counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+LOOKUPS = metrics.counter("llm_cache_lookups_total", "Provider response cache lookups", ["result"])
+local = threading.local()  # whether the last cached_call of this thread was answered from the cache
+
+def cache_key(provider, model, prompt, config):
+    # whitespace differences in the prompt do not change the answer, so they do not change the key
+    normalized = " ".join(prompt.split())
+    return hash_bytes(json.dumps([provider, model, normalized, config or {}], sort_keys=True).encode("utf-8"))
+
+def count(name):
+    with lock:
+        counters[name] += 1
+    LOOKUPS.inc(result=name)
+
+def lookup(key):
+    # cached value or None, counts the hit
+    # memory entries keep their creation time too, a response read back from disk must not live longer than LLM_CACHE_TTL
+    with lock:
+        entry = memory_cache.get(key)
+    if entry is not None and time.time() - entry["created"] < LLM_CACHE_TTL:
+        count("memory_hits")
+        return entry["value"]
+    entry = disk_cache.get(key)
+    if entry and time.time() - entry["created"] < LLM_CACHE_TTL:
+        count("disk_hits")
+        with lock:
+            memory_cache[key] = entry
+        return entry["value"]
+    return None
+
+def store(key, value):
+    if value:  # empty answers and errors are not worth keeping
+        entry = {"created": time.time(), "value": value}
+        with lock:
+            memory_cache[key] = entry
+        disk_cache.set(key, entry)
+
+def cached_call(provider, model, prompt, config, call, use_cache=True):
+    """
+        Return the response for a prompt, from the cache if it was seen before
+
+        Input:
+        provider, model - strings, part of the key
+        prompt - string
+        config - dict of generation settings, part of the key
+        call - function without arguments that asks the provider (its result must be JSON-serialisable)
+        use_cache - False skips the lookup, the fresh response still replaces the cached one
+
+        Output:
+        the response
+    """
+    key = cache_key(provider, model, prompt, config)
+    local.hit = False
+    if use_cache:
+        value = lookup(key)
+        if value is not None:
+            local.hit = True
+            return value
+        count("misses")
+    else:
+        count("bypassed")
+
+    value = call()
+    store(key, value)
+    return value
+
+def cached_stream(provider, model, prompt, config, stream, use_cache=True):
+    """
+        Streaming version of cached_call. A cached response is yielded in one piece,
+        otherwise the pieces are passed through and the complete response is cached at the end
+
+        Input:
+        provider, model, prompt, config, use_cache - as for cached_call
+        stream - function without arguments returning an iterator of text pieces
+
+        Output:
+        generator of text pieces
+    """
+    key = cache_key(provider, model, prompt, config)
+    if use_cache:
+        value = lookup(key)
+        if value is not None:
+            yield value
+            return
+        count("misses")
+    else:
+        count("bypassed")
+
+    pieces = []
+    for piece in stream():
+        pieces.append(piece)
+        yield piece
+    store(key, "".join(pieces).strip())
+
+def was_hit():
+    # True if the last cached_call on this thread did not reach the provider, used to keep latency statistics honest
+    return getattr(local, "hit", False)
+
+def stats():
+    with lock:
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_items": len(memory_cache),
+        }
@@ -1,257 +1,336 @@
 # Necessary imports
-from flask import Flask, request, jsonify, render_template, send_file
-import tempfile
-from reportlab.lib import colors  # used for PDF generation
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+import time  # used to measure execution time
+startup_begin = time.time()
+from flask import Flask, request, jsonify, render_template, send_file, url_for, Response, copy_current_request_context, g
 from flask_cors import CORS  # handles cross-origin issues during frontend-backend connection
-from pytesseract import pytesseract  # used for OCR if PDF is image-based
 from dotenv import load_dotenv  # loads environment variables like API keys
 import os
-from pdf2image import convert_from_bytes  # converts PDF pages to images
-import time  # used to measure execution time
-import requests  # for sending HTTP requests (used for Mistral)
-import google.generativeai as genai  # Gemini API
-from pypdf import PdfReader  # extracts text from normal (text-based) PDFs
-import io
+import ollama_client  # pooled, timeout-aware HTTP client for Ollama (used for Mistral)
 from markdown import markdown  # to render summary in markdown
 import json
 import random
 import string
-import wave
-from piper import PiperVoice
-from bs4 import BeautifulSoup
-import re
+import queue
+import math
+import io
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor  # sends MCQ batches concurrently
+from disk_cache import DiskCache, hash_bytes  # caches extracted text by PDF hash
+from text_extraction import extract_pages, extraction_method, PAGE_BREAK  # pypdf per page, OCR where needed
+from text_normalization import NORMALIZE_TEXT, normalize_pages  # drops headers, footers and page numbers before prompting
+from pipeline import run_stages  # runs summary, audio and MCQ generation concurrently
+import tts_jobs  # synthesizes summary audio in the background
+import generation_jobs  # queued generations run by a bounded worker pool
+from summarizer import condense  # map-reduce summary for long documents
+import llm_cache  # reuses provider responses for identical prompts
+import provider_router  # picks the faster healthy provider, falls back and hedges
+import rate_limiter  # requests/tokens per minute and in-flight cap for Gemini
+from rate_limiter import RateLimited
+from mcq_parser import ObjectStreamParser, parse_objects  # finds and repairs question objects in provider output
+from chunk_index import relevant_text  # BM25 over document chunks, picks the text for selected topics
+import resources  # heavy models and SDKs (Gemini, Piper, reportlab, bs4) are loaded on first use
+import downloads  # renders the PDF/TXT downloads in memory and caches them
+import metrics  # counters and histograms served on /metrics
+from result_store import SESSION_COOKIE, RESULT_TTL, new_id, valid_id, get_session, set_session, save_result, get_result  # per-session state
 
 STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
 load_dotenv()
 
-latest_summary = ""
-latest_mcqs = ""
-topicsExtracted = False # to keep track of topic extraction state
-
 app = Flask(__name__, template_folder='templates')
 CORS(app)  # allows requests from other origins (frontend)
 
+# the caller's session id from the cookie; a new session gets its cookie in set_session_cookie
+def session_id():
+    sid = request.cookies.get(SESSION_COOKIE)
+    if valid_id(sid):
+        return sid
+    if "new_session_id" not in g:
+        g.new_session_id = new_id()
+    return g.new_session_id
+
+@app.after_request
+def set_session_cookie(response):
+    if "new_session_id" in g:
+        response.set_cookie(SESSION_COOKIE, g.new_session_id, max_age=RESULT_TTL, httponly=True, samesite="Lax")
+    return response
+
+REQUEST_SECONDS = metrics.histogram("http_request_seconds", "Time until the response headers were ready, per endpoint",
+                                    ["endpoint", "method", "status"])
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if "request_start" in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or "unknown",
+                                method=request.method, status=response.status_code)
+    return response
+
+# the result named by ?result_id=, otherwise the latest result of the caller's session
+def requested_result():
+    result_id = request.args.get('result_id') or get_session(session_id())["result_id"]
+    return get_result(result_id)
+
 # setup Gemini model
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-gemini_model = genai.GenerativeModel('gemini-2.0-flash')
-eng_voice = PiperVoice.load("en_US-lessac-high.onnx")
-hin_voice = PiperVoice.load("hi_IN-pratham-medium.onnx")
+def load_gemini():
+    import google.generativeai as genai  # Gemini API
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")  # e.g. the stub server of benchmarks/load_test.py
+    if endpoint:
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"), transport="rest", client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel('gemini-2.0-flash')
+
+def load_voice(model_path):
+    from piper import PiperVoice
+    return PiperVoice.load(model_path)
+
+resources.register("gemini", load_gemini)
+resources.register("eng_voice", lambda: load_voice("en_US-lessac-high.onnx"))
+resources.register("hin_voice", lambda: load_voice("hi_IN-pratham-medium.onnx"))
+
+MCQ_BATCH_SIZE = int(os.getenv("MCQ_BATCH_SIZE", 25))  # questions asked for in one provider call
+MCQ_PARALLEL_BATCHES = int(os.getenv("MCQ_PARALLEL_BATCHES", 4))  # batches in flight at once per request
+
+# the client posts the same PDF twice (topics, then generation), so keep extracted text around
+extraction_cache = DiskCache("extraction", max_bytes=int(os.getenv("EXTRACTION_CACHE_MB", 512)) * 1024 * 1024)
 
 def ishindi(text):
     return any('\u0900' <= char <= '\u097F' for char in text)
 
-def generate_with_ollama(prompt):
+def generate_with_ollama(prompt, use_cache=True):
     try:
-        url = "http://localhost:11434/api/generate"
-        print("Generating with Mistral (Ollama)...")
-
-        payload = {
-            "model": "mistral",
-            "prompt": prompt,
-            "stream": False
-        }
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
+        def request_ollama():
+            print("Generating with Mistral (Ollama)...")
+            data = ollama_client.generate(prompt, model="mistral")
+            return data.get("response", "").strip()
 
-        data = response.json()
-        return data.get("response", "").strip()
+        return llm_cache.cached_call("ollama", "mistral", prompt, {}, request_ollama, use_cache)
 
     except Exception as e:
         print(f"Ollama connection error: {e}")
         return None
 
-def generate_with_gemini(prompt):
+# every Gemini call goes through the shared rate limiter
+def gemini_generate(prompt, generation_config=None):
+    with rate_limiter.limit("gemini-2.0-flash", prompt), metrics.provider_call("gemini", "gemini-2.0-flash"):
+        return resources.get("gemini").generate_content(contents=prompt, generation_config=generation_config).text
+
+def generate_with_gemini(prompt, use_cache=True):
     try:
-        print("Generating with Gemini...")
-        response = gemini_model.generate_content(
-            contents=prompt,
-            generation_config={'response_mime_type': 'application/json'}
-        )
-        return response.text.strip()
+        generation_config = {'response_mime_type': 'application/json'}
+
+        def request_gemini():
+            print("Generating with Gemini...")
+            return gemini_generate(prompt, generation_config).strip()
+
+        return llm_cache.cached_call("gemini", "gemini-2.0-flash", prompt, generation_config, request_gemini, use_cache)
+    except RateLimited:
+        raise  # answered with 429 instead of an empty quiz
     except Exception as e:
         print(f"Gemini error: {e}")
         return None
  
+# form inputs shared by home() and the queued jobs
+def generation_options(form):
+    return {
+        "count": int(form.get('question_count', 5)),
+        "difficulty": form.get('difficulty', 'Medium'),
+        "topic": form.get('topic', 'All'),
+        "provider": form.get('provider', 'gemini'),
+        # lets the user ask for fresh results instead of cached provider responses
+        "use_cache": form.get('no_cache', 'false').lower() not in ('1', 'true', 'on'),
+        "mcqType": form.get('mcqType', 'mcq'),
+    }
+
 @app.route('/', methods=['POST', 'GET'])
 def home():
-    global latest_summary, latest_mcqs, topicsExtracted
+    state = get_session(session_id())
     if request.method == 'POST':
         start_time = time.time()
 
         # get uploaded file and form inputs
         pdf_file = request.files.get('pdf_file')
-        count = int(request.form.get('question_count', 5))
-        difficulty = request.form.get('difficulty', 'Medium')
-        topic = request.form.get('topic', 'All')
-        provider = request.form.get('provider', 'gemini')
-        mcqType = request.form.get('mcqType', 'mcq')
+        options = generation_options(request.form)
 
         if not pdf_file:
             return jsonify({"error": "No PDF file provided"}), 400
 
         # extract text from PDF
         extract_start = time.time()
-        text, method = extract_text_from_pdf(pdf_file)
+        text, method, page_methods = extract_text_from_pdf(pdf_file)
         extract_time = time.time() - extract_start
         print(f"Extraction took {extract_time} seconds")
         
         if not text.strip():
             return jsonify({"error": "No text extracted from PDF"}), 400
 
-        # run based on whether topics have been extracted
+        # run based on whether topics have been extracted; the page sends its own step,
+        # other clients alternate between the two steps per session
+        step = request.form.get('topicsExtracted')
+        topicsExtracted = step.lower() == 'true' if step is not None else state["topics_extracted"]
         if not topicsExtracted:
-            topicsExtracted = True
+            state["topics_extracted"] = True
+            set_session(session_id(), state)
             topic_extraction_start = time.time()
-            topics = topic_extraction(text)
+            topics = topic_extraction(text, options["use_cache"])
             topic_extraction_time = time.time() - topic_extraction_start
             print(f"Topic extraction took {topic_extraction_time} seconds")
             return jsonify({"topics": topics})
         else:
-            topicsExtracted = False
-            # generate summary
-            summary_start = time.time()
-            summarized_text = summary(text)
-            summary_time = time.time() - summary_start
-            print(f"Summarization took {summary_time} seconds")
-
-            # generate MCQs
-            mcq_start = time.time()
-            mcqs = generate_mcqs(text, count=count, difficulty=difficulty, topic=topic, provider=provider, mcqType=mcqType)
-            mcq_time = time.time() - mcq_start
-            print(f"MCQ generation took {mcq_time} seconds")
-
-            total_time = time.time() - start_time
-
-            latest_summary = summarized_text
-            latest_mcqs = mcqs
+            state["topics_extracted"] = False
+            set_session(session_id(), state)
+            body = generate_quiz(session_id(), text, method, page_methods, options, start_time, extract_time)
+            body["audio_job"] = audio_links(body["audio_job"])
 
             # send final response
-            return jsonify({
-                "summary": summarized_text,
-                "mcqs": mcqs,
-                "metadata": {
-                    "topic": topic,
-                    "difficulty": difficulty,
-                    "question_count": count,
-                    "extraction_method": method,
-                    "provider": provider,
-                    "mcqType": mcqType
-                },
-                "timing": {
-                    "extraction_time": f"{extract_time:.2f}s",
-                    "summary_time": f"{summary_time:.2f}s",
-                    "mcq_time": f"{mcq_time:.2f}s",
-                    "total_time": f"{total_time:.2f}s"
-                }
-            })
-    else:
-        # resetting the flag whenever user reloads (GET request)
-        topicsExtracted = False
+            return jsonify(body)
+    elif state["topics_extracted"]:
+        # resetting the flag whenever user reloads (GET request); a page view without a pending step
+        # saves nothing, or every new visitor would push a saved result out of the store
+        state["topics_extracted"] = False
+        set_session(session_id(), state)
     return render_template('index.html')
 
+# the generate step of home(), also run by queued jobs; returns the response body with the audio job id
+def generate_quiz(sid, text, method, page_methods, options, start_time, extract_time, on_stage=None):
+    use_cache = options["use_cache"]
+    # summary (then queueing its audio) and MCQs do not depend on each other, so run them side by side
+    results, stage_timing = run_stages({
+        "summary": (lambda: summary(text, use_cache), []),
+        "tts_queue": (lambda summarized: synthesize_audio(summarized, text), ["summary"]),
+        "mcq": (lambda: generate_mcqs(text, count=options["count"], difficulty=options["difficulty"], topic=options["topic"], provider=options["provider"], mcqType=options["mcqType"], use_cache=use_cache), []),
+    }, on_stage)
+    summarized_text = results["summary"]
+    mcqs = results["mcq"]
+    audio_job = results["tts_queue"]
+    summary_time = stage_timing["stages"]["summary"]
+    tts_queue_time = stage_timing["stages"]["tts_queue"]
+    mcq_time = stage_timing["stages"]["mcq"]
+    print(f"Summarization took {summary_time} seconds")
+    print(f"Audio job {audio_job} queued in {tts_queue_time} seconds")
+    print(f"MCQ generation took {mcq_time} seconds")
+
+    total_time = time.time() - start_time
+
+    result_id = save_result(sid, summarized_text, mcqs)
+
+    return {
+        "result_id": result_id,
+        "summary": summarized_text,
+        "mcqs": mcqs,
+        "audio_job": audio_job,
+        "metadata": {
+            "topic": options["topic"],
+            "difficulty": options["difficulty"],
+            "question_count": options["count"],
+            "extraction_method": method,
+            "page_methods": page_methods,
+            "provider": options["provider"],
+            "mcqType": options["mcqType"]
+        },
+        "timing": {
+            "extraction_time": f"{extract_time:.2f}s",
+            "summary_time": f"{summary_time:.2f}s",
+            "tts_queue_time": f"{tts_queue_time:.2f}s",
+            "mcq_time": f"{mcq_time:.2f}s",
+            "critical_path": " -> ".join(stage_timing["critical_path"]),
+            "critical_path_time": f"{stage_timing['critical_path_time']:.2f}s",
+            "total_time": f"{total_time:.2f}s"
+        }
+    }
+
+# links of an audio job (None without audio); built per request, so queued results only store the id
+def audio_links(audio_job):
+    if audio_job is None:
+        return None
+    return {
+        "id": audio_job,
+        "status_url": url_for('audio_status', job_id=audio_job),
+        "audio_url": url_for('audio_file', job_id=audio_job),
+        "stream_url": url_for('audio_stream', job_id=audio_job)
+    }
+
 @app.route('/download/pdf', methods=['GET'])
 def download_pdf():
-    if not latest_summary and not latest_mcqs:
+    result = requested_result()
+    if not result:
         return "No data to download", 400
-    
-    try:
-        mcq_list = json.loads(latest_mcqs)
-    except:
-        mcq_list = []
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    doc = SimpleDocTemplate(temp_file.name)
-    styles = getSampleStyleSheet()
-
-    # Custom styles
-    question_style = ParagraphStyle('QuestionStyle', parent=styles['BodyText'], spaceAfter=6, fontSize=11, leading=14)
-    answer_style = ParagraphStyle('AnswerStyle', parent=styles['BodyText'], textColor=colors.green, spaceAfter=12)
-    heading_style = ParagraphStyle('HeadingStyle', parent=styles['Heading1'], spaceAfter=12)
-
-    elements = []
-
-    # Summary
-    elements.append(Paragraph("📄 Summary", heading_style))
-    elements.append(Paragraph(latest_summary, styles['BodyText']))
-    elements.append(Spacer(1, 15))
-
-    # MCQs
-    elements.append(Paragraph("📝 Multiple Choice Questions", heading_style))
-    for i, mcq in enumerate(mcq_list, start=1):
-        elements.append(Paragraph(f"{i}. {mcq['question']}", question_style))
-
-        # Bullet list for options
-        option_items = [
-            ListItem(Paragraph(f"{chr(65+idx)}. {opt}", styles['BodyText']), bulletColor=colors.black)
-            for idx, opt in enumerate(mcq['options'])
-        ]
-        elements.append(ListFlowable(option_items, bulletType='bullet', start='circle'))
-
-        # Correct Answer
-        correct_opt = f"{chr(65+mcq['correctAnswer'])}. {mcq['options'][mcq['correctAnswer']]}"
-        elements.append(Paragraph(f"✅ Correct Answer: <b>{correct_opt}</b>", answer_style))
-
-        # Explanation
-        elements.append(Paragraph(f"ℹ {mcq['explanation']}", styles['BodyText']))
-        elements.append(Spacer(1, 12))
-
-    doc.build(elements)
-    return send_file(temp_file.name, as_attachment=True, download_name="results.pdf")
+    return downloads.send("pdf", result["summary"], result["mcqs"])
 
 @app.route('/download/txt', methods=['GET'])
 def download_txt():
-    if not latest_summary and not latest_mcqs:
+    result = requested_result()
+    if not result:
         return "No data to download", 400
-
-    # Remove HTML from summary
-    clean_summary = BeautifulSoup(latest_summary, "html.parser").get_text()
-
-    try:
-        mcq_list = json.loads(latest_mcqs)
-    except:
-        mcq_list = []
-
-    content = "📄 Summary\n" + clean_summary + "\n\n📝 Multiple Choice Questions\n"
-    for i, mcq in enumerate(mcq_list, start=1):
-        content += f"{i}. {mcq['question']}\n"
-        for idx, opt in enumerate(mcq['options']):
-            content += f"   {chr(65+idx)}. {opt}\n"
-        content += f"✅ Correct Answer: {chr(65+mcq['correctAnswer'])}. {mcq['options'][mcq['correctAnswer']]}\n"
-        content += f"ℹ Explanation: {mcq['explanation']}\n\n"
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".txt", mode='w', encoding='utf-8')
-    temp_file.write(content)
-    temp_file.close()
-    return send_file(temp_file.name, as_attachment=True, download_name="results.txt")
-
-
-# tries to extract text using pypdf, falls back to OCR if text not found
+    return downloads.send("txt", result["summary"], result["mcqs"])
+
+@app.route('/audio/<job_id>', methods=['GET'])
+def audio_status(job_id):
+    job = tts_jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown audio job"}), 404
+    return jsonify({
+        "id": job_id,
+        "status": job["status"],
+        "error": job["error"],
+        "audio_url": url_for('audio_file', job_id=job_id) if job["status"] == "done" else None
+    })
+
+@app.route('/audio/<job_id>/wav', methods=['GET'])
+def audio_file(job_id):
+    job = tts_jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown audio job"}), 404
+    if job["status"] != "done":
+        # not ready yet, the client should keep polling the status endpoint
+        return jsonify({"id": job_id, "status": job["status"], "error": job["error"]}), 202
+    return send_file(tts_jobs.audio_path(job_id), mimetype="audio/wav")
+
+@app.route('/audio/<job_id>/stream', methods=['GET'])
+def audio_stream(job_id):
+    # still being written, follow the job's synthesis instead of waiting for the whole file
+    chunks = tts_jobs.stream(job_id)
+    if chunks is not None:
+        return Response(chunks, mimetype="audio/wav")
+    job = tts_jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown audio job"}), 404
+    if job["status"] == "done":
+        return send_file(tts_jobs.audio_path(job_id), mimetype="audio/wav")
+    return jsonify({"id": job_id, "status": job["status"], "error": job["error"]}), 500 if job["status"] == "error" else 202
+
+# returns cached text for a PDF that was already extracted, otherwise extracts and caches it
 def extract_text_from_pdf(pdf_file):
     pdf_bytes = pdf_file.read()
-    text = ''
-    try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text
-        if len(text.strip())/len(reader.pages) > 50:
-            print("[INFO] Used pypdf for text extraction.")
-            return text, "pypdf"
-    except Exception as e:
-        print(f"[WARN] pypdf failed: {e}")
-
-    # fallback: use OCR on image version of PDF
-    print("[INFO] Falling back to OCR with pytesseract.")
-    images = convert_from_bytes(pdf_bytes, dpi=75, grayscale=True)
-    text = ''
-    for image in images:
-        text += pytesseract.image_to_string(image)
-    return text, "ocr"
-
-def topic_extraction(text):
+    pdf_hash = hash_bytes(pdf_bytes)
+    cached = extraction_cache.get(pdf_hash)
+    # text cached with NORMALIZE_TEXT set differently is extracted again
+    if cached and cached.get("normalized", False) == NORMALIZE_TEXT:
+        print(f"[INFO] Extraction cache hit ({cached['method']}).")
+        return cached["text"], cached["method"], cached.get("page_methods", [])
+
+    with metrics.span("extraction"):
+        text, method, page_methods = extract_text_from_bytes(pdf_bytes)
+    extraction_cache.set(pdf_hash, {"text": text, "method": method, "page_methods": page_methods, "normalized": NORMALIZE_TEXT})
+    return text, method, page_methods
+
+# reads each page with pypdf and only OCRs the pages that have no usable text, then strips the boilerplate
+def extract_text_from_bytes(pdf_bytes):
+    pages = extract_pages(pdf_bytes)
+    method = extraction_method(pages)
+    print(f"[INFO] Used {method} for text extraction.")
+    texts, stats = normalize_pages([page["text"] for page in pages])
+    if stats["chars_saved"]:
+        share = stats["chars_saved"] / stats["chars_before"] * 100
+        print(f"[INFO] Normalization removed {stats['chars_saved']} characters (~{stats['tokens_saved']} tokens, {share:.1f}%), "
+              f"{stats['repeated_lines']} repeated header/footer lines.")
+    text = PAGE_BREAK.join(texts)
+    return text, method, [page["method"] for page in pages]
+
+def topic_extraction(text, use_cache=True):
     prompt = f"""You are tasked with summarizing educational content. Identify around 10 key educational themes from the provided text. 
     Guidelines:
 
@@ -276,126 +355,131 @@ Output format (JSON array of strings):
 Text:
 "{text}"
 """
-    response_topics = gemini_model.generate_content(
-            contents=prompt,
-            generation_config={'response_mime_type': 'application/json'}
-    )
-    return response_topics.text
+    generation_config = {'response_mime_type': 'application/json'}
+    with metrics.span("topics"):
+        return llm_cache.cached_call(
+            "gemini", "gemini-2.0-flash", prompt, generation_config,
+            lambda: gemini_generate(prompt, generation_config),
+            use_cache
+        )
 
 # sends summary request to local Mistral (Ollama) API
-def summary(text):
+def summary(text, use_cache=True):
+    # long documents are condensed chunk by chunk first, the final call summarizes those notes
+    text = condense(text, gemini_generate, "gemini", "gemini-2.0-flash", use_cache)
     prompt = f"Please create the summary for following text: {text}.\nDirectly begin with summary. Make it readable by a common user, making the PDF simple to understand. You can also use markdown to make it visually appealing. However make sure it remains formal in nature, do not be too casual/informal. Also make sure the summary is concise, do not make it too long. Make sure to retain the language of the text. That is, if the text is in Hindi, keep your response in Hindi too. Try to use markdown as much as possible. Use formatting techniques like giving proper heading format to title, bullet points, etc. to make it look visually appealing."
-    response_text = markdown(gemini_model.generate_content(contents=prompt).text)
-    print("Summarization done. Generating audio...")
-    voice = hin_voice if ishindi(text) else eng_voice
-    audio_path = os.path.join(STATIC_FOLDER, "audio.wav")
-    with wave.open(audio_path, "wb") as wav_file:
-        voice.synthesize_wav(BeautifulSoup(response_text, 'html.parser').get_text(), wav_file)
+    response_text = llm_cache.cached_call(
+        "gemini", "gemini-2.0-flash", prompt, {},
+        lambda: gemini_generate(prompt),
+        use_cache
+    )
     # markdown makes the summary display better on frontend
-    return response_text
-
-# uses Gemini to generate MCQs in JSON format
-def generate_mcqs(text, count, difficulty, topic, provider, mcqType):
-    batch_size = 100
-    final_response = ""
-
-    for i in range(0, count, batch_size):
-        print("[INFO] Generating MCQs batch:", i + 1)
-        batch_count = min(batch_size, count - i)
+    return markdown(response_text)
 
-        # detailed instruction to force Gemini to return pure JSON
-        error_messages = []
-        mcqs = []
-        specificPrompt = ""
-        match mcqType:
-            case "mcq":
-                print("[INFO] Making single correct answer questions")
-                specificPrompt = f"""
-                The question asks for multiple choice questions, with one correct answer.
-                There must be only one correct answer.
-                There must be in total 4 options, and the correctAnswer parameter in JSON must be from 0-3.
-                The format must be in JSON, as specified below:
-                [
-                    {{
-                        "question": "question here",
-                        "options": ["option1", "option2", "option3", "option4"],
-                        "correctAnswer": ["number of answer which is correct, that is, from 0 to 3. make sure to start from 0."],
-                        "explanation": "explanation why correctAnswer is correct",
-                        "topic": "relevant topic that the question belongs to"
-                    }},
-                    ...
-                ]
-                """
-            case "fib":
-                print("[INFO] Making fill in the blanks questions")
-                specificPrompt = f"""
-                The question asks for fill in the blank questions, with one correct answer.
-                There must be only one correct answer.
-                There must be in total 4 options, and the correctAnswer parameter in JSON must be from 0-3.
-                The format must be in JSON, as specified below:
-                [
-                    {{
-                        "question": "Question here. The question must include the field '________' which indicates the blank. The question must have this."
-                        "options": ["option1", "option2", "option3", "option4"],
-                        "correctAnswer": "number of answer which is correct, that is, from 0 to 3. make sure to start from 0.",
-                        "explanation": "explanation why correctAnswer is correct",
-                        "topic": "relevant topic that the question belongs to"
-                    }},
-                    ...
-                ]
-                """
-            case "trueFalse":
-                print("[INFO] Making true false type questions")
-                specificPrompt = f"""
-                The question asks for true false type questions, with one correct answer.
-                There must be only one correct answer.
-                The correct answer must be either True or False.
-                There must be only and only 2 options, which will be 'True' and 'False'. There must strictly be only 2 options.
-                The correctAnswer field of JSON must be labelled by numbers, that is, 0 and 1. True will be 0, False will be 1.
-                The format must be in JSON, as specified below:
-                [
-                    {{
-                        "question": "question here",
-                        "options": ["True", "False"],
-                        "correctAnswer": "number of answer which is correct, that is, from 0 to 1. make sure to start from 0.",
-                        "explanation": "explanation why correctAnswer is correct",
-                        "topic": "relevant topic that the question belongs to"
-                    }},
-                    ...
-                ]
-                """
-            case "msq":
-                print("[INFO] Making multiple answer correct questions")
-                specificPrompt = f"""
-                The question asks for multiple answer correct questions, with MORE THAN ONE correct answers.
-                There must be more than one correct answer.
-                There must be 4 options, out of which 2 OR more than 2 are correct.
-                The correctAnswer field of JSON must be an array of correct options. Each element in this array must be the number of answer which is correct, that is, from 0 to 3.
-                The format must be in JSON, as specified below:
-                [
-                    {{
-                        "question": "question here",
-                        "options": ["option1", "option2", "option3", "option4"],
-                        "correctAnswer": ["2", "3", "4"],
-                        "explanation": "explanation why the options given in correctAnswer are correct",
-                        "topic": "relevant topic that the question belongs to"
-                    }},
-                    ...
-                ]
-                In the format above, notice how correctAnswer field is an array of the number (index) of the options which are correct, that is, '2', '3' and '4'. You must make correctAnswer field as such an array, which contains elements as the number (index) of the options which are correct. The options must be numbers from 0-3. The options must NOT be the actual text content of the options.
-                Example:
-                [
-                    {{
-                        "question": "Which of the following are primary colors in the RGB color model?",
-                        "options": ["Red", "Blue", "Purple", "Green"],
-                        "correctAnswer": ["1", "2", "4"],
-                        "explanation": "In the RGB color model, the primary colors are Red, Green, and Blue. These are combined in various intensities to create other colors. Purple is not a primary color in this model.",
-                        "topic": "Color Theory"
-                    }},
-                    ...
-                ]
-                """
-        prompt = f"""
+# queues reading the summary out loud, using the Hindi voice for Hindi text; returns the audio job id (None without a voice)
+def synthesize_audio(summary_html, text):
+    from bs4 import BeautifulSoup
+    try:
+        voice = resources.get("hin_voice" if ishindi(text) else "eng_voice")
+    except Exception as e:
+        # a missing voice model only costs the audio, not the quiz
+        print(f"[WARN] No voice for the summary audio: {e}")
+        return None
+    return tts_jobs.submit(voice, BeautifulSoup(summary_html, 'html.parser').get_text())
+
+# builds the prompt for one batch of questions
+def build_mcq_prompt(text, batch_count, batch_number, batch_total, difficulty, topic, mcqType):
+    # detailed instruction to force Gemini to return pure JSON
+    specificPrompt = ""
+    match mcqType:
+        case "mcq":
+            print("[INFO] Making single correct answer questions")
+            specificPrompt = f"""
+            The question asks for multiple choice questions, with one correct answer.
+            There must be only one correct answer.
+            There must be in total 4 options, and the correctAnswer parameter in JSON must be from 0-3.
+            The format must be in JSON, as specified below:
+            [
+                {{
+                    "question": "question here",
+                    "options": ["option1", "option2", "option3", "option4"],
+                    "correctAnswer": ["number of answer which is correct, that is, from 0 to 3. make sure to start from 0."],
+                    "explanation": "explanation why correctAnswer is correct",
+                    "topic": "relevant topic that the question belongs to"
+                }},
+                ...
+            ]
+            """
+        case "fib":
+            print("[INFO] Making fill in the blanks questions")
+            specificPrompt = f"""
+            The question asks for fill in the blank questions, with one correct answer.
+            There must be only one correct answer.
+            There must be in total 4 options, and the correctAnswer parameter in JSON must be from 0-3.
+            The format must be in JSON, as specified below:
+            [
+                {{
+                    "question": "Question here. The question must include the field '________' which indicates the blank. The question must have this."
+                    "options": ["option1", "option2", "option3", "option4"],
+                    "correctAnswer": "number of answer which is correct, that is, from 0 to 3. make sure to start from 0.",
+                    "explanation": "explanation why correctAnswer is correct",
+                    "topic": "relevant topic that the question belongs to"
+                }},
+                ...
+            ]
+            """
+        case "trueFalse":
+            print("[INFO] Making true false type questions")
+            specificPrompt = f"""
+            The question asks for true false type questions, with one correct answer.
+            There must be only one correct answer.
+            The correct answer must be either True or False.
+            There must be only and only 2 options, which will be 'True' and 'False'. There must strictly be only 2 options.
+            The correctAnswer field of JSON must be labelled by numbers, that is, 0 and 1. True will be 0, False will be 1.
+            The format must be in JSON, as specified below:
+            [
+                {{
+                    "question": "question here",
+                    "options": ["True", "False"],
+                    "correctAnswer": "number of answer which is correct, that is, from 0 to 1. make sure to start from 0.",
+                    "explanation": "explanation why correctAnswer is correct",
+                    "topic": "relevant topic that the question belongs to"
+                }},
+                ...
+            ]
+            """
+        case "msq":
+            print("[INFO] Making multiple answer correct questions")
+            specificPrompt = f"""
+            The question asks for multiple answer correct questions, with MORE THAN ONE correct answers.
+            There must be more than one correct answer.
+            There must be 4 options, out of which 2 OR more than 2 are correct.
+            The correctAnswer field of JSON must be an array of correct options. Each element in this array must be the number of answer which is correct, that is, from 0 to 3.
+            The format must be in JSON, as specified below:
+            [
+                {{
+                    "question": "question here",
+                    "options": ["option1", "option2", "option3", "option4"],
+                    "correctAnswer": ["2", "3", "4"],
+                    "explanation": "explanation why the options given in correctAnswer are correct",
+                    "topic": "relevant topic that the question belongs to"
+                }},
+                ...
+            ]
+            In the format above, notice how correctAnswer field is an array of the number (index) of the options which are correct, that is, '2', '3' and '4'. You must make correctAnswer field as such an array, which contains elements as the number (index) of the options which are correct. The options must be numbers from 0-3. The options must NOT be the actual text content of the options.
+            Example:
+            [
+                {{
+                    "question": "Which of the following are primary colors in the RGB color model?",
+                    "options": ["Red", "Blue", "Purple", "Green"],
+                    "correctAnswer": ["1", "2", "4"],
+                    "explanation": "In the RGB color model, the primary colors are Red, Green, and Blue. These are combined in various intensities to create other colors. Purple is not a primary color in this model.",
+                    "topic": "Color Theory"
+                }},
+                ...
+            ]
+            """
+    prompt = f"""
 Create {batch_count} questions based on this text extracted from PDF:\n\n{text}
 Requirements:
 - difficulty: The topic must have {difficulty} level of difficulty
@@ -404,6 +488,7 @@ Requirements:
   * clear question stem
   * concise explanation
   * topic tag
+- This is batch {batch_number} of {batch_total}. Cover different parts of the text than the other batches would, do not repeat common questions
 - Make sure to preserve the language of the original PDF text (e.g., Hindi stays Hindi)
 - If topic = 'All', you can choose appropriate topics yourself, but do not set every topic as "All"
 - Final output must be in pure JSON format:
@@ -416,70 +501,159 @@ Requirements:
 - The user has given you the task of creating a certain type of question. Follow the following rules:\n{specificPrompt}
 
 PLEASE PLEASE PLEASE MAKE IT IN JSON ONLY. DO NOT GIVE ANY EXTRA TEXT IN THE BEGINNING OR IN THE END. I HAVE TO PARSE THE JSON THAT IS GIVEN BY YOU FURTHER. SO PLEASE ONLY GIVE JSON. PLEASE GIVE JSON ONLY. GIVE JSON FORMAT ONLY. DO NOT WRITE ANYTHING ELSE. DO NOT PUT NEWLINES OR ANYTHING WHICH IS NOT IN JSON FORMAT."""
+    return prompt
 
+# sends one batch through the provider router and returns (valid MCQs without ids, error messages)
+def generate_mcq_batch(prompt, topic, provider, use_cache=True):
     print(f"Prompt length: {len(prompt)} characters")
-    
+    result, used = provider_router.route(
+        provider,
+        lambda name: ask_for_mcqs(prompt, topic, name, use_cache),
+        lambda result: bool(result[0])  # a response without a single valid MCQ counts as a failure
+    )
+    if result is None:
+        return [], ["Every provider failed"]
+    if used != provider_router.provider_name(provider):
+        print(f"[INFO] Batch answered by {used}")
+    return result
+
+# asks one provider for a batch and returns (valid MCQs without ids, error messages)
+def ask_for_mcqs(prompt, topic, provider, use_cache=True):
+    error_messages = []
+    mcqs = []
+
     try:
         print(f"Using provider: {provider}")
         if provider.startswith('ollama'):
-            response_text = generate_with_ollama(prompt)
+            response_text = generate_with_ollama(prompt, use_cache)
         else:  # Default to Gemini
-            response_text = generate_with_gemini(prompt)
-            
+            response_text = generate_with_gemini(prompt, use_cache)
+
         if not response_text:
             error_messages.append("Provider returned empty response")
-            return json.dumps([])
-            
+            return [], error_messages
+
         print(f"Raw response ({len(response_text)} chars): {response_text[:200]}...")
 
-        # Clean response - remove markdown code blocks
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        
-        # Remove any text outside JSON brackets
-        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if json_match:
-            response_text = json_match.group(0)
-            
-        # Try direct JSON parse
-        try:
-            mcqs = json.loads(response_text)
-            if not isinstance(mcqs, list):
-                error_messages.append("Response is not a JSON array")
-                mcqs = []
-        except json.JSONDecodeError as e:
-            error_messages.append(f"JSON parse error: {e}")
+        # each question object is parsed on its own, so one malformed or cut off question only loses itself
+        mcqs, parser = parse_objects(response_text)
+        if parser.repaired:
+            print(f"[INFO] Repaired {parser.repaired} malformed MCQs")
+        if parser.failed:
+            error_messages.append(f"{parser.failed} malformed MCQs skipped")
+            print(f"[WARN] Skipped {parser.failed} malformed MCQs")
+        if not mcqs:
+            error_messages.append("No JSON objects found in response")
             print(f"Invalid JSON: {response_text[:500]}")
-            
+
+    except RateLimited:
+        raise
     except Exception as e:
         error_messages.append(f"Unexpected error: {e}")
         print(f"Exception: {str(e)}")
-    
-    # Validate and add IDs to MCQs
+
+    # Validate MCQs
+    valid_mcqs = [mcq for mcq in (clean_mcq(mcq, topic) for mcq in mcqs) if mcq]
+    if len(valid_mcqs) < len(mcqs):
+        error_messages.append(f"{len(mcqs) - len(valid_mcqs)} MCQs with missing fields skipped")
+    return valid_mcqs, error_messages
+
+# returns the MCQ with its fields normalized, or None if it is missing required fields
+def clean_mcq(mcq, topic):
+    if not isinstance(mcq, dict):
+        return None
+
+    # Ensure all required fields exist
+    required_keys = ['question', 'options', 'correctAnswer', 'explanation']
+    if not all(key in mcq for key in required_keys):
+        return None
+
+    # Ensure correctAnswer is integer
+    if isinstance(mcq['correctAnswer'], str):
+        try:
+            mcq['correctAnswer'] = int(mcq['correctAnswer'])
+        except ValueError:
+            mcq['correctAnswer'] = 0
+
+    if 'topic' not in mcq or not str(mcq['topic']).strip():
+        mcq['topic'] = topic
+    return mcq
+
+# yields the response text of a provider as it is generated (a cached response comes in one piece)
+def stream_provider(prompt, provider, use_cache=True):
+    # streams are not hedged, "auto" just picks the provider the router ranks first
+    provider = provider_router.order(provider)[0]
+    if provider.startswith('ollama'):
+        print("Streaming with Mistral (Ollama)...")
+        return llm_cache.cached_stream("ollama", "mistral", prompt, {},
+                                       lambda: ollama_client.stream_generate(prompt, model="mistral"), use_cache)
+
+    generation_config = {'response_mime_type': 'application/json'}
+
+    def gemini_pieces():
+        print("Streaming with Gemini...")
+        # the in-flight slot is held until the whole response has arrived
+        with rate_limiter.limit("gemini-2.0-flash", prompt), metrics.provider_call("gemini", "gemini-2.0-flash"):
+            response = resources.get("gemini").generate_content(contents=prompt, generation_config=generation_config, stream=True)
+            for chunk in response:
+                yield chunk.text
+
+    return llm_cache.cached_stream("gemini", "gemini-2.0-flash", prompt, generation_config, gemini_pieces, use_cache)
+
+# yields each valid MCQ of one batch as soon as its JSON object is complete
+def stream_mcq_batch(prompt, topic, provider, use_cache=True):
+    parser = ObjectStreamParser()
+    for piece in stream_provider(prompt, provider, use_cache):
+        for mcq in parser.feed(piece):
+            mcq = clean_mcq(mcq, topic)
+            if mcq:
+                yield mcq
+    # a response cut off at the token limit still has its last, partial question
+    for mcq in parser.finish():
+        mcq = clean_mcq(mcq, topic)
+        if mcq:
+            yield mcq
+    if parser.failed:
+        print(f"[WARN] Skipped {parser.failed} malformed MCQs in streamed batch")
+
+# one prompt per batch of at most MCQ_BATCH_SIZE questions
+def mcq_prompts(text, count, difficulty, topic, mcqType):
+    batch_counts = [min(MCQ_BATCH_SIZE, count - i) for i in range(0, count, MCQ_BATCH_SIZE)]
+    print(f"[INFO] Generating {count} MCQs in {len(batch_counts)} batches")
+
+    # for specific topics only the matching parts of the document are sent
+    text = relevant_text(text, topic)
+    return [build_mcq_prompt(text, batch_count, number, len(batch_counts), difficulty, topic, mcqType)
+            for number, batch_count in enumerate(batch_counts, start=1)]
+
+# generates MCQs in batches of MCQ_BATCH_SIZE, sent to the provider concurrently and merged in order
+def generate_mcqs(text, count, difficulty, topic, provider, mcqType, use_cache=True):
+    prompts = mcq_prompts(text, count, difficulty, topic, mcqType)
+    if not prompts:
+        return json.dumps([])
+
+    error_messages = []
     valid_mcqs = []
-    for idx, mcq in enumerate(mcqs):
-        if not isinstance(mcq, dict):
-            continue
-            
-        # Ensure all required fields exist
-        required_keys = ['question', 'options', 'correctAnswer', 'explanation']
-        if all(key in mcq for key in required_keys):
-            mcq['id'] = idx + 1
-            
-            # Ensure correctAnswer is integer
-            if isinstance(mcq['correctAnswer'], str):
-                try:
-                    mcq['correctAnswer'] = int(mcq['correctAnswer'])
-                except ValueError:
-                    mcq['correctAnswer'] = 0
-            
-            if 'topic' not in mcq or not str(mcq['topic']).strip():
-                mcq['topic'] = topic
-                
-            valid_mcqs.append(mcq)
-    
+    seen_questions = set()
+    with ThreadPoolExecutor(max_workers=min(len(prompts), MCQ_PARALLEL_BATCHES)) as executor:
+        futures = [executor.submit(generate_mcq_batch, prompt, topic, provider, use_cache) for prompt in prompts]
+        # merge in batch order; a failed batch only loses its own questions
+        for number, future in enumerate(futures, start=1):
+            try:
+                batch_mcqs, batch_errors = future.result()
+            except RateLimited:
+                raise
+            except Exception as e:
+                batch_mcqs, batch_errors = [], [f"Unexpected error: {e}"]
+            error_messages.extend(f"batch {number}: {error}" for error in batch_errors)
+            for mcq in batch_mcqs:
+                key = str(mcq['question']).strip().lower()
+                if key in seen_questions:
+                    continue
+                seen_questions.add(key)
+                mcq['id'] = len(valid_mcqs) + 1
+                valid_mcqs.append(mcq)
+
     # If we got fewer questions than requested
     if len(valid_mcqs) < count:
         error_messages.append(f"Only got {len(valid_mcqs)}/{count} valid MCQs")
@@ -489,14 +663,211 @@ PLEASE PLEASE PLEASE MAKE IT IN JSON ONLY. DO NOT GIVE ANY EXTRA TEXT IN THE BEG
     
     return json.dumps(valid_mcqs)
 
-    # load and clean up final JSON output
-    final_response_json = json.loads(final_response)
-    for idx, val in enumerate(final_response_json):
-        if isinstance(val['correctAnswer'], str):
-            val['correctAnswer'] = int(val['correctAnswer'])
-        val.update({'id': idx+1})  # add ID to each MCQ
-    print(final_response_json)
-    return json.dumps(final_response_json)
+# same inputs as the generate step of home(), but questions are sent as Server-Sent Events as soon as each one is complete
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    start_time = time.time()
+
+    pdf_file = request.files.get('pdf_file')
+    options = generation_options(request.form)
+    count, difficulty, topic, provider = options["count"], options["difficulty"], options["topic"], options["provider"]
+    mcqType, use_cache = options["mcqType"], options["use_cache"]
+
+    if not pdf_file:
+        return jsonify({"error": "No PDF file provided"}), 400
+
+    text, method, page_methods = extract_text_from_pdf(pdf_file)
+    if not text.strip():
+        return jsonify({"error": "No text extracted from PDF"}), 400
+
+    # the generator below runs after the request, so the session is resolved now
+    sid = session_id()
+    set_session(sid, {**get_session(sid), "topics_extracted": False})
+
+    # every producer thread puts (event, data) here and ends with a (None, None)
+    events = queue.Queue()
+    prompts = mcq_prompts(text, count, difficulty, topic, mcqType)
+
+    def run_batch(prompt):
+        try:
+            for mcq in stream_mcq_batch(prompt, topic, provider, use_cache):
+                events.put(("question", mcq))
+        except Exception as e:
+            print(f"[WARN] Streamed batch failed: {e}")
+            events.put(("error", {"error": str(e)}))
+        finally:
+            events.put((None, None))
+
+    def run_summary():
+        try:
+            summarized_text = summary(text, use_cache)
+            audio_job = synthesize_audio(summarized_text, text)
+            events.put(("summary", {
+                "summary": summarized_text,
+                "audio_job": audio_links(audio_job)
+            }))
+        except Exception as e:
+            print(f"[WARN] Summary failed: {e}")
+            events.put(("error", {"error": str(e)}))
+        finally:
+            events.put((None, None))
+
+    executor = ThreadPoolExecutor(max_workers=MCQ_PARALLEL_BATCHES + 1)
+    # submitted first, so the summary always gets a thread instead of queueing behind the batches;
+    # url_for in the summary thread needs the request context
+    executor.submit(copy_current_request_context(run_summary))
+    for prompt in prompts:
+        executor.submit(run_batch, prompt)
+    executor.shutdown(wait=False)
+
+    def event_stream():
+        mcqs = []
+        seen_questions = set()
+        summarized_text = ""
+        first_question_time = None
+        producers = len(prompts) + 1
+        while producers:
+            event, data = events.get()
+            if event is None:
+                producers -= 1
+                continue
+            if event == "question":
+                key = str(data['question']).strip().lower()
+                if key in seen_questions or len(mcqs) >= count:
+                    continue
+                seen_questions.add(key)
+                data['id'] = len(mcqs) + 1
+                mcqs.append(data)
+                if first_question_time is None:
+                    first_question_time = time.time() - start_time
+            elif event == "summary":
+                summarized_text = data["summary"]
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+        result_id = save_result(sid, summarized_text, json.dumps(mcqs))
+        total_time = time.time() - start_time
+        done = {
+            "result_id": result_id,
+            "metadata": {
+                "topic": topic,
+                "difficulty": difficulty,
+                "question_count": count,
+                "extraction_method": method,
+                "page_methods": page_methods,
+                "provider": provider,
+                "mcqType": mcqType
+            },
+            "timing": {
+                "first_question_time": f"{first_question_time:.2f}s" if first_question_time is not None else None,
+                "total_time": f"{total_time:.2f}s"
+            }
+        }
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return Response(event_stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# queued version of home(): answers at once with a job id, the pipeline runs on the generation worker pool
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    pdf_file = request.files.get('pdf_file')
+    if not pdf_file:
+        return jsonify({"error": "No PDF file provided"}), 400
+    # "topics" for the topic list, "generate" for summary and MCQs
+    step = request.form.get('step', 'generate')
+    if step not in ('topics', 'generate'):
+        return jsonify({"error": "step must be 'topics' or 'generate'"}), 400
+
+    options = generation_options(request.form)
+    pdf_bytes = pdf_file.read()
+    sid = session_id()
+
+    def run_job(progress):
+        start_time = time.time()
+        progress("extraction", "running")
+        text, method, page_methods = extract_text_from_pdf(io.BytesIO(pdf_bytes))
+        extract_time = time.time() - start_time
+        progress("extraction", "done", extract_time)
+        if not text.strip():
+            raise ValueError("No text extracted from PDF")
+
+        if step == 'topics':
+            progress("topics", "running")
+            topics = topic_extraction(text, options["use_cache"])
+            progress("topics", "done", time.time() - start_time - extract_time)
+            return {"topics": topics}
+        return generate_quiz(sid, text, method, page_methods, options, start_time, extract_time, progress)
+
+    stages = ["extraction", "topics"] if step == 'topics' else ["extraction", "summary", "tts_queue", "mcq"]
+    try:
+        job_id = generation_jobs.submit(run_job, stages)
+    except queue.Full:
+        response = jsonify({"error": "Too many queued jobs, try again later"})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for('job_status', job_id=job_id),
+        "result_url": url_for('job_result', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    info = generation_jobs.status(job_id)
+    if info is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(info)
+
+# the same body as home() once the job is done, 202 while it is still queued or running
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = generation_jobs.result(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job["status"] == "error":
+        return jsonify({"error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"status": job["status"]}), 202
+    body = dict(job["result"])
+    if "audio_job" in body:
+        body["audio_job"] = audio_links(body["audio_job"])
+    return jsonify(body)
+
+@app.route('/providers/stats', methods=['GET'])
+def providers_stats():
+    return jsonify({**provider_router.stats(), "gemini_limits": rate_limiter.stats()})
+
+# calls that could not get a Gemini slot in time, or hit the API quota
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = str(math.ceil(e.retry_after))
+    return response, 429
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(llm_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/startup', methods=['GET'])
+def startup():
+    return jsonify({"startup_time": f"{startup_time:.3f}s", **resources.report()})
+
+# OCR workers import this script again (as __mp_main__), they must not load models or report a start.
+# Their process name is set before that import, parent_process() only afterwards
+is_worker = multiprocessing.current_process().name != "MainProcess"
+
+# optionally load the models in the background now, so the first request does not pay for it
+if os.getenv("WARM_UP", "0") == "1" and not is_worker:
+    resources.warm_up()
+
+startup_time = time.time() - startup_begin
+if not is_worker:
+    print(f"[INFO] Started in {startup_time:.3f} seconds.")
 
 # Run the app
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+# Pulls question objects out of provider output while it is still being generated,
+# repairing the usual LLM mistakes instead of losing the whole batch to one of them
+
+import json
+import metrics
+
+CLOSERS = {"{": "}", "[": "]"}
+QUESTION_KEYS = ("question", "options", "correctAnswer", "explanation")
+
+PARSE_SECONDS = metrics.histogram("mcq_parse_seconds", "Time to parse a complete provider response",
+                                  buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+OBJECTS = metrics.counter("mcq_objects_total", "Question objects found in provider output", ["result"])
+
+def strip_trailing_commas(text):
+    # drops a comma that directly precedes a closing bracket, ignoring commas inside strings
+    out = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "}]":
+            end = len(out)
+            while end and out[end - 1].isspace():
+                end -= 1
+            if end and out[end - 1] == ",":
+                del out[end - 1]
+        out.append(char)
+    return "".join(out)
+
+def close_truncated(text, stack):
+    # completes an object cut off between members: drops a trailing comma and closes the brackets
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    return text + "".join(CLOSERS[opener] for opener in reversed(stack))
+
+def unwrap(value):
+    # {"questions": [{...}, ...]} -> the inner objects; a question object (or anything else) is kept as it is
+    if isinstance(value, dict) and not any(key in value for key in QUESTION_KEYS):
+        for member in value.values():
+            if isinstance(member, list) and member and all(isinstance(item, dict) for item in member):
+                return member
+    return [value]
+
+def loads(text):
+    """
+        json.loads, retried once with trailing commas removed
+
+        Output:
+        value - parsed value, None if the text could not be parsed
+        repaired - True if the value needed the retry
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    try:
+        return json.loads(strip_trailing_commas(text)), True
+    except ValueError:
+        return None, False
+
+class ObjectStreamParser:
+    """
+        Feed it text as it arrives, get back every top-level JSON object as soon as its closing brace arrives.
+        Anything around the objects (the array brackets, commas, markdown fences) is ignored, so every
+        object stands on its own and a malformed one only loses itself. The text is scanned once.
+        An object that only wraps a list of objects (e.g. {"questions": [...]}) returns that list instead
+
+        Counters:
+        parsed - objects returned
+        repaired - objects that only parsed after removing trailing commas or closing a truncated tail
+        failed - objects that could not be parsed and were skipped
+    """
+
+    def __init__(self):
+        self.buffer = []  # characters of the object being read
+        self.stack = []  # open brackets of the object being read
+        self.in_string = False
+        self.escaped = False
+        self.checkpoint = None  # (buffer length, open brackets) at the last comma, where a truncated object can be cut
+        self.parsed = 0
+        self.repaired = 0
+        self.failed = 0
+
+    def reset(self):
+        self.buffer = []
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.checkpoint = None
+
+    def accept(self, value, repaired, objects):
+        if value is None:
+            self.failed += 1
+            return
+        values = unwrap(value)
+        self.parsed += len(values)
+        self.repaired += repaired * len(values)
+        objects.extend(values)
+
+    def feed(self, text):
+        objects = []
+        for char in text:
+            if not self.stack:
+                if char == "{":
+                    self.stack = [char]
+                    self.buffer = [char]
+                continue
+
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == ",":
+                self.checkpoint = (len(self.buffer) - 1, list(self.stack))
+            elif char in CLOSERS:
+                self.stack.append(char)
+            elif char in "}]":
+                if CLOSERS[self.stack[-1]] != char:
+                    # mismatched bracket, the object is broken beyond repair
+                    self.failed += 1
+                    self.reset()
+                    continue
+                self.stack.pop()
+                if not self.stack:
+                    self.accept(*loads("".join(self.buffer)), objects)
+                    self.reset()
+        return objects
+
+    def finish(self):
+        """
+            Call once the output is complete. An object cut off at the end is closed. If the last member
+            is incomplete (a string cut off mid-sentence, half a number, a key without a value) it is dropped
+
+            Output:
+            objects - the repaired last object, or an empty list
+        """
+        objects = []
+        if self.stack:
+            value = None
+            # a cut off string would show text that stops mid-sentence, so its member is dropped instead
+            if not self.in_string:
+                value, _ = loads(close_truncated("".join(self.buffer), self.stack))
+            if value is None and self.checkpoint:
+                length, stack = self.checkpoint
+                value, _ = loads(close_truncated("".join(self.buffer[:length]), stack))
+            self.accept(value, True, objects)
+            self.reset()
+        # counted once per response, the counters are final now
+        OBJECTS.inc(self.parsed - self.repaired, result="clean")
+        OBJECTS.inc(self.repaired, result="repaired")
+        OBJECTS.inc(self.failed, result="failed")
+        return objects
+
+def parse_objects(text):
+    """
+        Parse complete provider output
+
+        Input:
+        text - response text, usually a JSON array of objects, possibly fenced, truncated or with trailing commas
+
+        Output:
+        objects - list of parsed objects in order
+        parser - the ObjectStreamParser, for its counters
+    """
+    parser = ObjectStreamParser()
+    with PARSE_SECONDS.time():
+        objects = parser.feed(text)
+        objects.extend(parser.finish())
+    return objects, parser
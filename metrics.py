@@ -0,0 +1,160 @@
+# In-process metrics - counters and histograms, exposed on /metrics in the Prometheus text format
+#
+# Recording is a dict lookup, a bisect and a few additions under a lock, cheap enough for every page and call.
+# Each process keeps its own numbers; with several workers, scrape each of them (or aggregate in Prometheus).
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "quizgen_"
+# seconds, from a fast pypdf page up to a long summary call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = {}  # full name -> metric, in registration order
+registry_lock = threading.Lock()
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+        Monotonic count per label combination, e.g. calls_total{provider="gemini",outcome="ok"}
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for key, value in values.items():
+            yield f"{self.name}{format_labels(self.labels, key)} {format_number(value)}"
+
+class Histogram:
+    """
+        Distribution of observed values (usually seconds) per label combination, with fixed bucket bounds
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.bounds = tuple(sorted(buckets))
+        self.values = {}  # label values -> [count per bucket (last one is +Inf), sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        # observes the seconds spent inside the with block, also when it raises
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(buckets), total, count) for key, (buckets, total, count) in self.values.items()}
+        for key, (buckets, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.bounds + (math.inf,), buckets):
+                cumulative += bucket
+                yield f"{self.name}_bucket{format_labels(self.labels, key, [('le', format_number(float(bound)))])} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, key)} {format_number(total)}"
+            yield f"{self.name}_count{format_labels(self.labels, key)} {count}"
+
+def register(cls, name, help, labels, **kwargs):
+    # the same name always returns the same metric, so modules can declare what they use at import time
+    name = PREFIX + name
+    with registry_lock:
+        metric = registry.get(name)
+        if metric is None:
+            metric = registry[name] = cls(name, help, labels, **kwargs)
+        return metric
+
+def counter(name, help, labels=()):
+    return register(Counter, name, help, labels)
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return register(Histogram, name, help, labels, buckets=buckets)
+
+SPAN_SECONDS = histogram("span_seconds", "Duration of the steps of a request", ["span", "status"])
+PROVIDER_SECONDS = histogram("provider_call_seconds", "Duration of provider calls, until the whole response has arrived",
+                             ["provider", "model", "status"])
+
+@contextmanager
+def timed(metric, **labels):
+    # like Histogram.time, plus a status label: "ok", or "error" if the block raised
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        metric.observe(time.perf_counter() - start, status=status, **labels)
+
+def span(name):
+    """
+        Time a step of a request, recorded in span_seconds
+
+        Input:
+        name - step name, e.g. "extraction" or "summary"
+    """
+    return timed(SPAN_SECONDS, span=name)
+
+def provider_call(provider, model):
+    # times one call to a provider, recorded in provider_call_seconds
+    return timed(PROVIDER_SECONDS, provider=provider, model=model)
+
+def render():
+    """
+        All metrics in the Prometheus text exposition format
+
+        Output:
+        text - string, served with CONTENT_TYPE
+    """
+    with registry_lock:
+        metrics = list(registry.values())
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
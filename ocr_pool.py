@@ -0,0 +1,115 @@
+# Multi-core OCR - pages are spread over a shared process pool and returned in page order
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+# pages of a single request that may be OCR'd at the same time, so one big upload cannot take every worker
+OCR_MAX_PER_REQUEST = int(os.getenv("OCR_MAX_PER_REQUEST", max(1, OCR_WORKERS // 2)))
+
+OCR_PAGE_SECONDS = metrics.histogram("ocr_page_seconds", "Tesseract time per page, measured in the OCR worker")
+
+executor = None
+executor_lock = threading.Lock()
+
+def init_worker():
+    # each worker already is one core, stop tesseract from spawning its own threads on top
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            # not fork: by now the app runs threads (TTS, router, jobs) whose state a fork would copy.
+            # Workers still import the main script (as __mp_main__), which is why main.py and app.py skip
+            # their startup work (warm-up) in child processes; tts_jobs and provider_router start threads lazily
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["ocr_pool"])
+            else:
+                context = multiprocessing.get_context("spawn")  # Windows
+            executor = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=context, initializer=init_worker)
+            print(f"[INFO] Started OCR pool with {OCR_WORKERS} workers.")
+    return executor
+
+def replace_executor(broken):
+    # a worker died (e.g. tesseract crashed) and took the pool with it, start a new one
+    global executor
+    with executor_lock:
+        if executor is broken:  # another request may have replaced it already
+            executor = None
+            broken.shutdown(wait=False, cancel_futures=True)
+            print("[WARN] OCR pool broke, starting a new one.")
+    return get_executor()
+
+def ocr_image(image):
+    # runs in a worker process, so the time is sent back with the text instead of recorded there
+    import pytesseract  # imported in the workers only, keeps app startup light
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(image)
+    return text, time.perf_counter() - start
+
+def ocr_pages(images, max_workers=None):
+    """
+        OCR page images in parallel
+
+        Input:
+        images - iterable of PIL images, consumed lazily
+        max_workers - pages of this call in flight at once (defaults to OCR_MAX_PER_REQUEST)
+
+        Output:
+        texts - list of strings, in the same order as images
+    """
+    limit = max(1, min(max_workers or OCR_MAX_PER_REQUEST, OCR_WORKERS))
+    pool = get_executor()
+    restarted = False
+    texts = {}
+    pending = {}  # future -> (index, image), the image is kept so the page can be sent again
+
+    def restart():
+        # retried once on a new pool, with every page that was in flight
+        nonlocal pool, restarted
+        if restarted:
+            raise BrokenProcessPool("OCR pool broke again after a restart")
+        restarted = True
+        pool = replace_executor(pool)
+        for future, (index, image) in list(pending.items()):
+            del pending[future]
+            pending[pool.submit(ocr_image, image)] = (index, image)
+
+    def send(index, image):
+        try:
+            future = pool.submit(ocr_image, image)
+        except BrokenProcessPool:
+            restart()
+            future = pool.submit(ocr_image, image)
+        pending[future] = (index, image)
+
+    def collect(futures):
+        for future in futures:
+            if future not in pending:
+                continue  # sent again after a restart
+            try:
+                text, seconds = future.result()
+            except BrokenProcessPool:
+                restart()
+                return
+            index, _ = pending.pop(future)
+            OCR_PAGE_SECONDS.observe(seconds)
+            texts[index] = text
+
+    for index, image in enumerate(images):
+        while len(pending) >= limit:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        send(index, image)
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        collect(done)
+    return [texts[i] for i in range(len(texts))]
@@ -0,0 +1,95 @@
+# Shared HTTP transport for the local Ollama server - pooled keep-alive connections, timeouts and retries
+
+import json
+import os
+import random
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", 300))  # a hung model frees the worker after this
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", 2))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # keeps the model loaded between calls
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", 16))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+RETRIES = metrics.counter("ollama_retries_total", "Ollama requests retried after a connection error or overload response")
+
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+
+def backoff(attempt):
+    # exponential backoff with full jitter, so retries from many threads do not arrive together
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def post(path, payload, stream=False):
+    """
+        POST to the Ollama API, retrying connection failures and overload responses
+
+        Input:
+        path - API path, e.g. "/api/generate"
+        payload - dict sent as JSON
+        stream - True to read the response body incrementally
+
+        Output:
+        requests.Response (status already checked)
+    """
+    url = OLLAMA_URL.rstrip("/") + path
+    for attempt in range(OLLAMA_RETRIES + 1):
+        last_attempt = attempt == OLLAMA_RETRIES
+        try:
+            response = session.post(url, json=payload, stream=stream,
+                                    timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT))
+        except requests.ConnectionError as e:
+            # covers connect timeouts; read timeouts are not retried, a model that is too slow once will be again
+            if last_attempt:
+                raise
+            print(f"[WARN] Ollama connection failed ({e}), retrying...")
+            RETRIES.inc()
+        else:
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                response.raise_for_status()
+                return response
+            print(f"[WARN] Ollama returned {response.status_code}, retrying...")
+            RETRIES.inc()
+            response.close()
+        time.sleep(backoff(attempt))
+
+def generate(prompt, model="mistral"):
+    # non-streaming /api/generate, returns the response JSON
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }
+    with metrics.provider_call("ollama", model):
+        return post("/api/generate", payload).json()
+
+def stream_generate(prompt, model="mistral"):
+    # streaming /api/generate, yields the response text piece by piece as the model produces it
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+    }
+    with metrics.provider_call("ollama", model), post("/api/generate", payload, stream=True) as response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            if data.get("response"):
+                yield data["response"]
+            if data.get("done"):
+                break
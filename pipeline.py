@@ -0,0 +1,64 @@
+# Runs the independent stages of a request concurrently and records how long each one took
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+def run_stages(stages, on_stage=None):
+    """
+        Run a small graph of stages. Every stage starts as soon as the stages it depends on are done
+
+        Input:
+        stages - dict of name -> (function, list of dependency names), listed so that dependencies come first.
+                 The function is called with the results of its dependencies, in order
+        on_stage - optional function(name, status, seconds) called when a stage is "running", "done" or "error",
+                   seconds is the stage's duration once it has finished
+
+        Output:
+        results - dict of name -> return value
+        timing - dict with "stages" (name -> seconds), "critical_path" (list of names),
+                 "critical_path_time" and "wall_time" (seconds)
+    """
+    started = {}
+    finished = {}
+    futures = {}
+    pipeline_start = time.time()
+
+    def run(name, function, deps):
+        args = [futures[dep].result() for dep in deps]
+        started[name] = time.time()
+        if on_stage:
+            on_stage(name, "running", None)
+        status = "error"
+        try:
+            with metrics.span(name):
+                result = function(*args)
+            status = "done"
+            return result
+        finally:
+            finished[name] = time.time()
+            if on_stage:
+                on_stage(name, status, finished[name] - started[name])
+
+    # one thread per stage, so a stage waiting on its dependencies never blocks another stage
+    with ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        for name, (function, deps) in stages.items():
+            futures[name] = executor.submit(run, name, function, deps)
+        results = {name: future.result() for name, future in futures.items()}
+    wall_time = time.time() - pipeline_start
+
+    durations = {name: finished[name] - started[name] for name in stages}
+
+    # longest chain of dependent stages, this is what bounds the wall time
+    chains = {}
+    for name, (_, deps) in stages.items():
+        longest = max((chains[dep] for dep in deps), key=lambda chain: chain[1], default=([], 0.0))
+        chains[name] = (longest[0] + [name], longest[1] + durations[name])
+    path, path_time = max(chains.values(), key=lambda chain: chain[1])
+
+    return results, {
+        "stages": durations,
+        "critical_path": path,
+        "critical_path_time": path_time,
+        "wall_time": wall_time,
+    }
@@ -0,0 +1,193 @@
+# Chooses between Gemini and Ollama from their recent latency and errors, falls back and optionally hedges
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import llm_cache
+from rate_limiter import RateLimited
+
+PROVIDERS = ["gemini", "ollama"]
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", 50))  # recent calls per provider the statistics are based on
+# seconds a call counts in the statistics; "auto" stops sending to an unhealthy provider, so only
+# its old failures expiring lets it be measured (and chosen) again
+ROUTER_MAX_AGE = float(os.getenv("ROUTER_MAX_AGE", 300))
+ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", 0.5))  # providers failing more often are tried last
+ROUTER_MIN_SAMPLES = 5  # below this a provider's statistics are not trusted yet
+ROUTER_FALLBACK = os.getenv("ROUTER_FALLBACK", "1") == "1"  # try the other provider when the first one fails
+ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "0") == "1"  # also ask the other provider when the first is slower than its p95
+
+executor = None  # started on the first route, processes that only import this module never need it
+executor_lock = threading.Lock()
+lock = threading.Lock()
+# (time, value) pairs, oldest first
+latencies = {name: deque(maxlen=ROUTER_WINDOW) for name in PROVIDERS}  # seconds of successful, uncached calls
+outcomes = {name: deque(maxlen=ROUTER_WINDOW) for name in PROVIDERS}  # True for success, False for failure
+counters = {name: {"calls": 0, "errors": 0, "fallbacks": 0, "hedges": 0, "hedge_wins": 0} for name in PROVIDERS}
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=int(os.getenv("ROUTER_THREADS", 16)), thread_name_prefix="router")
+    return executor
+
+def provider_name(provider):
+    # form values are "gemini", "ollama_mistral" or "auto"
+    if provider == "auto":
+        return provider
+    return "ollama" if provider.startswith("ollama") else "gemini"
+
+def recent(samples):
+    # values of the samples younger than ROUTER_MAX_AGE, older ones are dropped; called with the lock held
+    cutoff = time.time() - ROUTER_MAX_AGE
+    while samples and samples[0][0] < cutoff:
+        samples.popleft()
+    return [value for _, value in samples]
+
+def record(name, seconds, ok, cached=False):
+    now = time.time()
+    with lock:
+        counters[name]["calls"] += 1
+        if not ok:
+            counters[name]["errors"] += 1
+        outcomes[name].append((now, ok))
+        # cached answers say nothing about how fast the provider is
+        if ok and not cached:
+            latencies[name].append((now, seconds))
+
+def percentile(name, q):
+    with lock:
+        samples = recent(latencies[name])
+    if len(samples) < ROUTER_MIN_SAMPLES:
+        return None
+    return float(np.percentile(samples, q))
+
+def error_rate(name):
+    with lock:
+        samples = recent(outcomes[name])
+    if len(samples) < ROUTER_MIN_SAMPLES:
+        return 0.0
+    return 1 - sum(samples) / len(samples)
+
+def healthy(name):
+    return error_rate(name) <= ROUTER_MAX_ERROR_RATE
+
+def order(provider):
+    """
+        Providers in the order they should be tried
+
+        Input:
+        provider - form value, "auto" picks the faster healthy provider
+
+        Output:
+        list of provider names, the requested (or best) one first
+    """
+    name = provider_name(provider)
+    if name != "auto":
+        return [name] + [other for other in PROVIDERS if other != name]
+
+    def rank(name):
+        # healthy first, then by median latency; providers without enough data rank first, so they get measured
+        median = percentile(name, 50)
+        return (not healthy(name), median if median is not None else 0.0)
+    return sorted(PROVIDERS, key=rank)
+
+def route(provider, attempt, accept):
+    """
+        Run attempt on the chosen provider, falling back to (or hedging with) the other one
+
+        Input:
+        provider - form value ("gemini", "ollama_mistral" or "auto")
+        attempt - function(name) asking one provider, exceptions count as failures
+        accept - function(result) returning True if the result is usable (e.g. it parsed into MCQs)
+
+        Output:
+        result - the first accepted result, otherwise the last one returned
+        name - provider that produced the result
+
+        If no attempt was accepted, a RateLimited from any attempt is raised again (so a quota error
+        becomes a 429, not an empty quiz), otherwise the exception of the last attempt if it raised
+    """
+    candidates = order(provider)
+    if not ROUTER_FALLBACK:
+        candidates = candidates[:1]
+
+    def timed(name):
+        start = time.time()
+        error = None
+        try:
+            result = attempt(name)
+            ok = accept(result)
+        except Exception as e:
+            print(f"[WARN] Provider {name} failed: {e}")
+            result, ok, error = None, False, e
+        record(name, time.time() - start, ok, llm_cache.was_hit())
+        return name, result, ok, error
+
+    running = {}
+    hedges = set()
+    last = (None, candidates[0])
+    last_error = None
+    rate_limited = None  # kept apart, a later attempt must not hide it
+    tried = 0
+
+    def launch():
+        nonlocal tried
+        name = candidates[tried]
+        tried += 1
+        running[get_executor().submit(timed, name)] = name
+        return name
+
+    first = launch()
+    # hedge once the first provider is slower than usual for it
+    hedge_after = percentile(first, 95) if ROUTER_HEDGE and len(candidates) > 1 else None
+    while running:
+        done, _ = wait(running, timeout=hedge_after, return_when=FIRST_COMPLETED)
+        if not done:
+            name = launch()
+            hedges.add(name)
+            with lock:
+                counters[name]["hedges"] += 1
+            print(f"[INFO] {first} is slower than its p95 ({hedge_after:.2f}s), also asking {name}")
+            hedge_after = None
+            continue
+        for future in done:
+            running.pop(future)
+            name, result, ok, last_error = future.result()
+            if isinstance(last_error, RateLimited) and rate_limited is None:
+                rate_limited = last_error
+            if ok:
+                if name in hedges:
+                    with lock:
+                        counters[name]["hedge_wins"] += 1
+                return result, name
+            last = (result, name)
+        # every attempt so far failed, fall back to the next provider
+        if not running and tried < len(candidates):
+            hedge_after = None
+            name = launch()
+            with lock:
+                counters[name]["fallbacks"] += 1
+            print(f"[WARN] Falling back to {name}")
+    if rate_limited is not None:
+        raise rate_limited
+    if last_error is not None:
+        raise last_error
+    return last
+
+def stats():
+    report = {}
+    for name in PROVIDERS:
+        p50, p95 = percentile(name, 50), percentile(name, 95)
+        with lock:
+            report[name] = {**counters[name], "window": len(recent(outcomes[name]))}
+        report[name].update({
+            "error_rate": round(error_rate(name), 3),
+            "healthy": healthy(name),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+        })
+    return {"providers": report, "auto_order": order("auto"), "hedging": ROUTER_HEDGE, "fallback": ROUTER_FALLBACK}
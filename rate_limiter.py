@@ -0,0 +1,151 @@
+# Client-side limits for Gemini - requests and tokens per minute plus a cap on calls in flight,
+# so bursts wait their turn (or get a clean 429) instead of running into quota errors
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", 15))  # requests per minute per model
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", 1000000))  # prompt tokens per minute per model
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", 4))  # calls per model running at the same time
+GEMINI_MAX_WAIT = float(os.getenv("GEMINI_MAX_WAIT", 30))  # seconds a call may queue before it is refused
+QUOTA_BACKOFF = 60  # seconds the limiter pauses after the API itself reported a quota error
+
+CHARS_PER_TOKEN = 4  # rough estimate, good enough for budgeting
+
+class RateLimited(Exception):
+    """
+        Raised when a call would have to wait longer than GEMINI_MAX_WAIT, or the API refused it.
+        retry_after is the number of seconds after which a retry is expected to succeed
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    # holds up to capacity tokens, refilled continuously at capacity per minute; not thread-safe on its own
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # seconds until amount tokens are available (amounts above capacity only need a full bucket)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+class Limiter:
+    """
+        Requests-per-minute and tokens-per-minute buckets plus an in-flight cap for one model
+    """
+
+    def __init__(self, rpm, tpm, max_in_flight):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+        self.counters = {"calls": 0, "waited": 0, "refused": 0, "quota_errors": 0, "wait_time": 0.0}
+
+    def acquire(self, tokens, max_wait):
+        start = time.monotonic()
+        deadline = start + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens), self.paused_until - now)
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    break
+                if now + wait > deadline:
+                    self.counters["refused"] += 1
+                    raise RateLimited(f"Gemini rate limit reached, retry in {math.ceil(wait)}s", wait)
+            time.sleep(wait)
+
+        # the buckets are paid for, now wait for a free slot within what is left of max_wait
+        if not self.in_flight.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            with self.lock:
+                self.counters["refused"] += 1
+            raise RateLimited("Too many Gemini calls in flight", 1.0)
+
+        waited = time.monotonic() - start
+        with self.lock:
+            self.counters["calls"] += 1
+            if waited > 0.01:
+                self.counters["waited"] += 1
+                self.counters["wait_time"] += waited
+
+    def release(self):
+        self.in_flight.release()
+
+    def pause(self, seconds):
+        # the API reported a quota error, so nothing is sent for a while
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.requests.tokens = 0
+            self.counters["quota_errors"] += 1
+
+limiters = {}
+limiters_lock = threading.Lock()
+
+def get_limiter(model):
+    with limiters_lock:
+        if model not in limiters:
+            limiters[model] = Limiter(GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_IN_FLIGHT)
+        return limiters[model]
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def is_quota_error(e):
+    # the Gemini SDK raises ResourceExhausted (HTTP 429); imported here as the SDK is loaded by then anyway
+    from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+    return isinstance(e, (ResourceExhausted, TooManyRequests))
+
+@contextmanager
+def limit(model, prompt, max_wait=None):
+    """
+        Hold a slot for one Gemini call, waiting for it if needed
+
+        Input:
+        model - model name, every model has its own limits
+        prompt - prompt text, used to estimate the tokens it costs
+        max_wait - seconds to queue at most, GEMINI_MAX_WAIT by default
+
+        Raises RateLimited if no slot is free in time, or if the call inside fails with a quota error
+    """
+    limiter = get_limiter(model)
+    limiter.acquire(estimate_tokens(prompt), GEMINI_MAX_WAIT if max_wait is None else max_wait)
+    try:
+        yield
+    except Exception as e:
+        if is_quota_error(e):
+            limiter.pause(QUOTA_BACKOFF)
+            raise RateLimited(f"Gemini quota exceeded: {e}", QUOTA_BACKOFF) from e
+        raise
+    finally:
+        limiter.release()
+
+def stats():
+    with limiters_lock:
+        models = dict(limiters)
+    report = {}
+    for model, limiter in models.items():
+        with limiter.lock:
+            report[model] = {**limiter.counters, "wait_time": round(limiter.counters["wait_time"], 3)}
+    return report
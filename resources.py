@@ -0,0 +1,53 @@
+# Registry of heavy models and SDKs - each one is imported and loaded the first time it is used
+
+import threading
+import time
+
+loaders = {}  # name -> function that builds the resource
+loaded = {}  # name -> resource
+load_times = {}  # name -> seconds it took to load
+locks = {}
+
+def register(name, loader):
+    loaders[name] = loader
+    locks[name] = threading.Lock()
+
+def get(name):
+    """
+        Return a resource, loading it on first use. Concurrent callers wait for a single load
+
+        Input:
+        name - string given to register()
+
+        Output:
+        the loaded resource
+    """
+    if name in loaded:
+        return loaded[name]
+    with locks[name]:
+        if name not in loaded:
+            start = time.time()
+            loaded[name] = loaders[name]()
+            load_times[name] = time.time() - start
+            print(f"[INFO] Loaded {name} in {load_times[name]:.2f} seconds.")
+    return loaded[name]
+
+def warm_up(names=None, background=True):
+    # loads resources ahead of the first request, in a background thread unless asked otherwise
+    def load_all():
+        for name in names or list(loaders):
+            try:
+                get(name)
+            except Exception as e:
+                print(f"[WARN] Could not warm up {name}: {e}")
+
+    if background:
+        threading.Thread(target=load_all, name="warm-up", daemon=True).start()
+    else:
+        load_all()
+
+def report():
+    return {
+        "loaded": {name: round(seconds, 3) for name, seconds in load_times.items()},
+        "not_loaded": [name for name in loaders if name not in loaded],
+    }
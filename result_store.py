@@ -0,0 +1,126 @@
+# Per-session state and generated results, so concurrent users (and worker processes) never see each other's quiz
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from cachetools import TTLCache
+from disk_cache import CACHE_ROOT
+
+RESULT_STORE = os.getenv("RESULT_STORE", "memory")  # "memory" for one process, "sqlite" to share between processes
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(CACHE_ROOT, "results.sqlite3"))
+RESULT_TTL = int(os.getenv("RESULT_TTL", 24 * 3600))  # seconds a session or result is kept after its last write
+RESULT_STORE_ITEMS = int(os.getenv("RESULT_STORE_ITEMS", 1000))  # memory backend only, least recently used go first
+
+SESSION_COOKIE = "sid"
+
+class MemoryStore:
+    """
+        In-process LRU with TTL. Only valid when the app runs as a single process (threads are fine)
+    """
+
+    def __init__(self, max_items, ttl):
+        self.items = TTLCache(maxsize=max_items, ttl=ttl)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.items.get(key)
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = value
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+class SqliteStore:
+    """
+        Shared SQLite file, so every gunicorn worker (or any process on the machine) sees the same state.
+        Values are stored as JSON and expired rows are removed on write
+    """
+
+    def __init__(self, path, ttl, table="results"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table  # fixed names from this repo only, never user input
+        self.local = threading.local()  # sqlite connections cannot be shared between threads
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.connection() as db:
+            db.execute("PRAGMA journal_mode=WAL")  # readers do not block the writer
+            db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            db.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires)")
+
+    def connection(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            self.local.db = db
+        return db
+
+    def get(self, key):
+        row = self.connection().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        with self.connection() as db:
+            db.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+                       (key, json.dumps(value, ensure_ascii=False), now + self.ttl))
+            db.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (now,))
+
+    def delete(self, key):
+        with self.connection() as db:
+            db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+def open_store(table="results", max_items=RESULT_STORE_ITEMS):
+    # every table is a store of its own, in memory one LRU cannot push out the items of another
+    if RESULT_STORE == "sqlite":
+        return SqliteStore(RESULT_STORE_PATH, RESULT_TTL, table)
+    if RESULT_STORE != "memory":
+        print(f"[WARN] Unknown RESULT_STORE '{RESULT_STORE}', using memory")
+    return MemoryStore(max_items, RESULT_TTL)
+
+store = open_store()
+
+def new_id():
+    return uuid.uuid4().hex
+
+def valid_id(value):
+    # ids come from cookies and query strings, only accept what new_id produces
+    return isinstance(value, str) and len(value) == 32 and all(c in "0123456789abcdef" for c in value)
+
+def get_session(session_id):
+    # session state: {"topics_extracted": bool, "result_id": id of the latest result or None}
+    return store.get(f"session:{session_id}") or {"topics_extracted": False, "result_id": None}
+
+def set_session(session_id, state):
+    store.set(f"session:{session_id}", state)
+
+def save_result(session_id, summary, mcqs):
+    """
+        Keep a generated quiz for downloads and make it the session's latest result
+
+        Input:
+        session_id - id from the session cookie
+        summary - summary HTML
+        mcqs - JSON string of the MCQ list
+
+        Output:
+        result id - string
+    """
+    result_id = new_id()
+    store.set(f"result:{result_id}", {"summary": summary, "mcqs": mcqs, "created": time.time()})
+    state = get_session(session_id)
+    state["result_id"] = result_id
+    set_session(session_id, state)
+    return result_id
+
+def get_result(result_id):
+    if not valid_id(result_id):
+        return None
+    return store.get(f"result:{result_id}")
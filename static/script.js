@@ -7,6 +7,8 @@
         let topicsExtracted = false;
 	let mcqType = 'mcq';
 	    let selectedTopics = [];
+        let audioJob = null; // background synthesis of the summary audio
+        let resultId = null; // server-side copy of the quiz, used by the downloads
 
         const elements = {
             downloadPdf: document.getElementById('downloadPdf'),
@@ -190,6 +192,12 @@ function renderQuizAnalysis() {
                 formData.append('provider', document.getElementById('provider').value);
                 formData.append('topicsExtracted', topicsExtracted);
 		formData.append('mcqType', document.getElementById('mcqType').value);
+                formData.append('no_cache', document.getElementById('noCache').checked);
+
+                if (topicsExtracted && window.ReadableStream && window.TextDecoder) {
+                    await streamMCQs(formData);
+                    return;
+                }
 
                 // Replace with your Flask backend URL
                 const response = await fetch('http://localhost:5000/' || 'http://127.0.0.1:5000/', {
@@ -203,6 +211,8 @@ function renderQuizAnalysis() {
                     mcqs = data.mcqs;
 		    mcqType = data.metadata.mcqType;
                     const summary = data.summary || '';
+                    audioJob = data.audio_job || null;
+                    resultId = data.result_id || null;
 
 		    if (typeof mcqs === "string") {
             try {
@@ -217,7 +227,9 @@ function renderQuizAnalysis() {
             topic: document.getElementById('topics').value,
             difficulty: document.getElementById('difficulty').value,
             mcqs: mcqs,
-	    summary: summary
+	    summary: summary,
+            audioJob: audioJob,
+            resultId: resultId
         });
         localStorage.setItem('mcqHistory', JSON.stringify(history));
         }
@@ -334,6 +346,14 @@ function renderQuizAnalysis() {
             container.innerHTML = '';
 
             mcqs.forEach((mcq, index) => {
+                container.appendChild(createMCQCard(mcq, index));
+            });
+
+            updateSubmitButton();
+        }
+
+        // Build the card of one MCQ
+        function createMCQCard(mcq, index) {
                 const mcqCard = document.createElement('div');
                 mcqCard.className = 'mcq-card';
 
@@ -382,11 +402,82 @@ function renderQuizAnalysis() {
                 mcqCard.appendChild(optionsContainer);
                 mcqCard.appendChild(explanationDiv);
 
-                // Append MCQ card to container
-                container.appendChild(mcqCard);
+                return mcqCard;
+        }
+
+        // Generate MCQs over Server-Sent Events, each question is shown as soon as it arrives
+        async function streamMCQs(formData) {
+            const response = await fetch('http://localhost:5000/generate/stream', {
+                method: 'POST',
+                body: formData,
             });
+            if (!response.ok || !response.body) {
+                throw new Error('Failed to generate MCQs');
+            }
 
-            updateSubmitButton();
+            mcqs = [];
+            audioJob = null;
+            resultId = null;
+            displayResults(mcqs, '');
+            const container = document.getElementById('mcqsList');
+            let summary = '';
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finished = false;
+            while (!finished) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // events are separated by a blank line
+                let end;
+                while ((end = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, end);
+                    buffer = buffer.slice(end + 2);
+                    let event = 'message';
+                    let data = '';
+                    frame.split('\n').forEach(line => {
+                        if (line.startsWith('event: ')) event = line.slice(7);
+                        else if (line.startsWith('data: ')) data += line.slice(6);
+                    });
+                    if (!data) continue;
+                    const payload = JSON.parse(data);
+
+                    if (event === 'question') {
+                        mcqs.push(payload);
+                        container.appendChild(createMCQCard(payload, mcqs.length - 1));
+                        document.getElementById('mcqCount').textContent = mcqs.length;
+                        updateSubmitButton();
+                    } else if (event === 'summary') {
+                        summary = payload.summary || '';
+                        audioJob = payload.audio_job || null;
+                        document.getElementById('summaryText').innerHTML = summary;
+                    } else if (event === 'error') {
+                        console.error('Error generating MCQs:', payload.error);
+                    } else if (event === 'done') {
+                        mcqType = payload.metadata.mcqType || mcqType;
+                        resultId = payload.result_id || null;
+                        finished = true;
+                    }
+                }
+            }
+
+            let history = JSON.parse(localStorage.getItem('mcqHistory') || '[]');
+            history.push({
+                timestamp: new Date().toISOString(),
+                topic: document.getElementById('topics').value,
+                difficulty: document.getElementById('difficulty').value,
+                mcqs: mcqs,
+                summary: summary,
+                audioJob: audioJob,
+                resultId: resultId
+            });
+            localStorage.setItem('mcqHistory', JSON.stringify(history));
+            resetTimer();
+            startTimer();
+            topicsExtracted = false;
         }
 
         
@@ -709,6 +800,8 @@ function deleteHistoryItem(index) {
             if (index >= 0 && index < history.length) {
                 mcqs = history[index].mcqs;
 		            summary = history[index].summary;
+                audioJob = history[index].audioJob || null;
+                resultId = history[index].resultId || null;
                 quizId = index; // Store the current quiz ID
                 displayResults(mcqs, summary);
                 switchTab('mcqs');
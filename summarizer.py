@@ -0,0 +1,53 @@
+# Map-reduce summarization - long documents are condensed chunk by chunk before the final summary
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from text_extraction import split_chunks
+import llm_cache
+
+SUMMARY_CHUNK_CHARS = int(os.getenv("SUMMARY_CHUNK_CHARS", 24000))  # text sent in one map call
+SUMMARY_PARALLEL_CHUNKS = int(os.getenv("SUMMARY_PARALLEL_CHUNKS", 4))  # map calls in flight at once
+
+def map_prompt(chunk):
+    return f"""Write concise bullet point notes of the key facts, definitions, examples and ideas in the following part of a document.
+Do not add an introduction or a conclusion. Keep the language of the text, that is, if the text is in Hindi, write the notes in Hindi too.
+
+Text:
+{chunk}"""
+
+def summarize_chunk(chunk, generate, provider, model, use_cache):
+    # chunk notes only depend on the chunk and the model, so they are cached like the final summary
+    # and a re-run with the cache on makes no provider calls at all
+    prompt = map_prompt(chunk)
+    notes = llm_cache.cached_call(provider, model, prompt, {}, lambda: generate(prompt), use_cache)
+    if not notes:
+        raise RuntimeError("Provider returned an empty chunk summary")
+    return notes
+
+def condense(text, generate, provider, model, use_cache=True):
+    """
+        Shrink text to fit in a single summary prompt. Short text is returned unchanged, long text is
+        split on page/section boundaries and the chunks are summarized in parallel (the map step)
+
+        Input:
+        text - string
+        generate - function(prompt) returning the model's response text, not cached itself
+        provider, model - names, part of the cache key
+        use_cache - False asks the provider for fresh notes, like the rest of the request
+
+        Output:
+        text for the final (reduce) summary prompt - string
+    """
+    if len(text) <= SUMMARY_CHUNK_CHARS:
+        return text
+
+    chunks = split_chunks(text, SUMMARY_CHUNK_CHARS)
+    print(f"[INFO] Summarizing {len(chunks)} chunks before the final summary.")
+    with ThreadPoolExecutor(max_workers=min(len(chunks), SUMMARY_PARALLEL_CHUNKS)) as executor:
+        notes = list(executor.map(lambda chunk: summarize_chunk(chunk, generate, provider, model, use_cache), chunks))
+    condensed = "\n\n".join(notes)
+
+    # very long books can still produce too many notes, condense those again
+    if len(condensed) > SUMMARY_CHUNK_CHARS and len(condensed) < len(text):
+        return condense(condensed, generate, provider, model, use_cache)
+    return condensed
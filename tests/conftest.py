@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# the modules under test live at the repository root; their caches go to a throwaway directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="tests-cache-"))
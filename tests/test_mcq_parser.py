@@ -0,0 +1,78 @@
+import json
+from mcq_parser import ObjectStreamParser, parse_objects
+
+def question(number, **extra):
+    return {"question": f"Q{number}?", "options": ["a", "b", "c", "d"], "correctAnswer": 1,
+            "explanation": f"Because {number}.", **extra}
+
+def test_plain_array():
+    objects, parser = parse_objects(json.dumps([question(1), question(2)]))
+    assert objects == [question(1), question(2)]
+    assert (parser.parsed, parser.repaired, parser.failed) == (2, 0, 0)
+
+def test_markdown_fence_and_prose_are_ignored():
+    text = "Here are your questions:\n```json\n" + json.dumps([question(1)]) + "\n```\nGood luck!"
+    objects, _ = parse_objects(text)
+    assert objects == [question(1)]
+
+def test_trailing_commas_are_repaired():
+    text = '[{"question": "Q1?", "options": ["a", "b", "c", "d",], "correctAnswer": 1, "explanation": "Because 1.",},]'
+    objects, parser = parse_objects(text)
+    assert objects == [question(1)]
+    assert parser.repaired == 1
+
+def test_commas_and_brackets_inside_strings_are_kept():
+    mcq = question(1, explanation='Use "a, b]" and {c},')
+    objects, parser = parse_objects(json.dumps([mcq]))
+    assert objects == [mcq]
+    assert parser.repaired == 0
+
+def test_malformed_object_only_loses_itself():
+    text = "[" + json.dumps(question(1)) + ', {"question": "Q2?", "options": ["a"}, ' + json.dumps(question(3)) + "]"
+    objects, parser = parse_objects(text)
+    assert objects == [question(1), question(3)]
+    assert parser.failed == 1
+
+def test_wrapped_array_is_unwrapped():
+    objects, parser = parse_objects(json.dumps({"questions": [question(1), question(2)]}))
+    assert objects == [question(1), question(2)]
+    assert parser.parsed == 2
+
+def test_truncated_wrapped_array_keeps_complete_questions():
+    text = json.dumps({"questions": [question(1), question(2)]})
+    objects, _ = parse_objects(text[:-20])
+    assert objects[0] == question(1)
+    assert "explanation" not in objects[1]
+
+def test_truncated_between_members_keeps_the_complete_ones():
+    text = json.dumps([question(1), question(2, topic="Plants")])
+    objects, parser = parse_objects(text[:text.rindex(', "topic"') + 1])
+    assert objects == [question(1), question(2)]
+    assert parser.repaired == 1
+
+def test_truncated_string_drops_its_member():
+    text = json.dumps([question(1), question(2)])
+    objects, _ = parse_objects(text[:text.rindex("Because 2") + 5])
+    assert objects[0] == question(1)
+    # the explanation was cut mid-sentence, so it is dropped rather than shown half-written
+    assert objects[1] == {"question": "Q2?", "options": ["a", "b", "c", "d"], "correctAnswer": 1}
+
+def test_truncated_inside_a_key_without_value():
+    text = json.dumps([question(1)])[:-1] + ', {"question": "Q2?", "options": ["a", "b", "c", "d"], "correctAn'
+    objects, _ = parse_objects(text)
+    assert objects == [question(1), {"question": "Q2?", "options": ["a", "b", "c", "d"]}]
+
+def test_streamed_pieces_give_the_same_objects():
+    text = json.dumps([question(number) for number in range(5)])
+    parser = ObjectStreamParser()
+    objects = []
+    for start in range(0, len(text), 7):
+        objects.extend(parser.feed(text[start:start + 7]))
+    objects.extend(parser.finish())
+    assert objects == [question(number) for number in range(5)]
+
+def test_objects_are_returned_as_soon_as_they_close():
+    parser = ObjectStreamParser()
+    first = json.dumps(question(1))
+    assert parser.feed("[" + first[:-1]) == []
+    assert parser.feed("}, {") == [question(1)]
@@ -0,0 +1,52 @@
+import pytest
+import provider_router
+from rate_limiter import RateLimited
+
+def accept(result):
+    return bool(result[0])
+
+def test_rate_limit_is_raised_when_fallback_returns_nothing():
+    def attempt(name):
+        if name == "gemini":
+            raise RateLimited("Gemini rate limit reached, retry in 12s", 12)
+        return [], ["Provider returned empty response"]
+
+    with pytest.raises(RateLimited) as error:
+        provider_router.route("gemini", attempt, accept)
+    assert error.value.retry_after == 12
+
+def test_rate_limit_is_not_raised_when_fallback_succeeds():
+    def attempt(name):
+        if name == "gemini":
+            raise RateLimited("Gemini rate limit reached", 12)
+        return [{"question": "Q?"}], []
+
+    assert provider_router.route("gemini", attempt, accept) == (([{"question": "Q?"}], []), "ollama")
+
+def test_empty_result_is_returned_without_errors():
+    def attempt(name):
+        return [], ["Provider returned empty response"]
+
+    result, name = provider_router.route("gemini", attempt, accept)
+    assert result == ([], ["Provider returned empty response"])
+    assert name == "ollama"
+
+def test_last_error_is_raised_when_every_provider_raises():
+    def attempt(name):
+        raise ValueError(name)
+
+    with pytest.raises(ValueError, match="ollama"):
+        provider_router.route("gemini", attempt, accept)
+
+def test_unhealthy_provider_is_tried_again_once_its_failures_expire(monkeypatch):
+    monkeypatch.setattr(provider_router, "outcomes", {name: provider_router.deque() for name in provider_router.PROVIDERS})
+    monkeypatch.setattr(provider_router, "latencies", {name: provider_router.deque() for name in provider_router.PROVIDERS})
+    for _ in range(provider_router.ROUTER_MIN_SAMPLES):
+        provider_router.record("gemini", 1.0, False)
+        provider_router.record("ollama", 2.0, True)
+    assert provider_router.order("auto") == ["ollama", "gemini"]
+
+    now = provider_router.time.time()
+    monkeypatch.setattr(provider_router.time, "time", lambda: now + provider_router.ROUTER_MAX_AGE + 1)
+    assert provider_router.healthy("gemini")
+    assert provider_router.order("auto")[0] == "gemini"
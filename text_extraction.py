@@ -1,13 +1,147 @@
 # Program for extracting text from PDFs - optionally using OCR
 
 import pypdf
-from pdf2image import convert_from_bytes
-import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
 import io
+import os
+import tempfile
+import time
+import metrics
+from ocr_pool import ocr_pages
+from text_normalization import normalize_pages
+
+MIN_PAGE_CHARS = 50  # pages with less embedded text than this are treated as scanned
+PAGE_BREAK = "\f"  # separates pages in joined text, so later steps can still tell pages apart
+RENDER_WINDOW = int(os.getenv("OCR_RENDER_WINDOW", 4))  # pages rasterized per pdftoppm call
+
+PYPDF_PAGE_SECONDS = metrics.histogram("pypdf_page_seconds", "pypdf text extraction time per page")
+RENDER_SECONDS = metrics.histogram("ocr_render_seconds", "pdftoppm time per window of rasterized pages")
+PAGES = metrics.counter("pages_total", "Pages extracted, by the method that produced their text", ["method"])
+
+def page_ranges(page_numbers):
+    # groups sorted page numbers into contiguous (first, last) runs
+    ranges = []
+    for number in page_numbers:
+        if ranges and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return [tuple(r) for r in ranges]
+
+def render_pages(pdf_path, page_numbers):
+    # rasterizes the requested pages lazily, a small window at a time, so memory does not grow with page count
+    for first, last in page_ranges(page_numbers):
+        for start in range(first, last + 1, RENDER_WINDOW):
+            end = min(start + RENDER_WINDOW - 1, last)
+            with RENDER_SECONDS.time():
+                images = convert_from_path(pdf_path, dpi=75, grayscale=True, first_page=start, last_page=end)
+            while images:
+                yield images.pop(0)  # drop our reference, the page is freed once it has been OCR'd
+
+def ocr_page_numbers(file, page_numbers=None):
+    # streams the given pages (all pages if None) through rasterization and OCR, returns texts in order
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "input.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(file)
+        if page_numbers is None:
+            page_numbers = range(1, pdfinfo_from_path(pdf_path)["Pages"] + 1)
+        return ocr_pages(render_pages(pdf_path, page_numbers))
+
+def extract_pages(file):
+    """
+        Extract text page by page. Pages with selectable text are read using pypdf,
+        only the pages without it are rasterized and OCR'd
+
+        Input:
+        file - bytes
+
+        Output:
+        pages - list of dicts with "page" (starting at 1), "text" and "method" ("pypdf" or "ocr")
+    """
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(file))
+        pages = []
+        for number, page in enumerate(reader.pages, start=1):
+            start = time.perf_counter()
+            try:
+                page_text = page.extract_text() or ""
+            except Exception as e:
+                print(f"[WARN] pypdf failed on page {number}: {e}")
+                page_text = ""
+            PYPDF_PAGE_SECONDS.observe(time.perf_counter() - start)
+            pages.append({"page": number, "text": page_text, "method": "pypdf"})
+    except Exception as e:
+        # unreadable for pypdf, OCR the whole document
+        print(f"[WARN] pypdf failed: {e}")
+        pages = [{"page": number, "text": page_text, "method": "ocr"}
+                 for number, page_text in enumerate(ocr_page_numbers(file), start=1)]
+        PAGES.inc(len(pages), method="ocr")
+        return pages
+
+    scanned = [page for page in pages if len(page["text"].strip()) < MIN_PAGE_CHARS]
+    if scanned:
+        print(f"[INFO] OCR for {len(scanned)} of {len(pages)} pages.")
+        try:
+            ocr_texts = ocr_page_numbers(file, [page["page"] for page in scanned])
+        except Exception as e:
+            # e.g. a blank cover page in a text PDF on a machine without poppler/tesseract,
+            # the document is still usable with what pypdf found
+            print(f"[WARN] OCR failed, keeping the pypdf text of {len(scanned)} pages: {e}")
+            scanned = []
+        else:
+            for page, page_text in zip(scanned, ocr_texts):
+                page["text"] = page_text
+                page["method"] = "ocr"
+    PAGES.inc(len(scanned), method="ocr")
+    PAGES.inc(len(pages) - len(scanned), method="pypdf")
+    return pages
+
+def extraction_method(pages):
+    # "pypdf" or "ocr" if every page used it, otherwise "hybrid"
+    methods = {page["method"] for page in pages}
+    if len(methods) > 1:
+        return "hybrid"
+    return methods.pop() if methods else "pypdf"
+
+def split_chunks(text, max_chars):
+    """
+        Split text into chunks of at most max_chars, cutting at page breaks first,
+        then at blank lines (sections/paragraphs) and only as a last resort inside a paragraph
+
+        Input:
+        text - string
+        max_chars - int
+
+        Output:
+        chunks - list of strings
+    """
+    pieces = []
+    for page in text.split(PAGE_BREAK):
+        if len(page) <= max_chars:
+            pieces.append(page)
+            continue
+        for paragraph in page.split("\n\n"):
+            pieces.extend(paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars))
+
+    # pack neighbouring pieces together while they fit
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if not piece.strip():
+            continue
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
 
 def extract_text(file):
     """
-        Extract text from PDF. Extract text directly using pypdf if text is selectable otherwise use OCR
+        Extract text from PDF. Extract text directly using pypdf if text is selectable otherwise use OCR.
+        Headers, footers and page numbers are removed, pages are separated by PAGE_BREAK
 
         Input:
         file - bytes
@@ -16,21 +150,7 @@ def extract_text(file):
         text - string
     """
     try:
-        file_stream = io.BytesIO(file)
-        pdf_reader = pypdf.PdfReader(file_stream)
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            page_text = page.extract_text() or ""
-            text += page_text
-        if text.strip():
-            return text
-        else:
-            pages = convert_from_bytes(file, dpi=75, grayscale=True)
-            ocr_text = ""
-            for i, page in enumerate(pages):
-                page_text = pytesseract.image_to_string(page)
-                ocr_text += f"--- Page {i + 1} ---\n{page_text}\n\n"
-            return ocr_text
+        texts, _ = normalize_pages([page["text"] for page in extract_pages(file)])
+        return PAGE_BREAK.join(texts)
     except Exception as e:
         return f"Error: {str(e)}"
@@ -0,0 +1,86 @@
+# Cleans extracted page texts before they are sent to a provider - running headers and footers,
+# page numbers, page markers, OCR hyphenation and extra whitespace only cost tokens
+
+import math
+import os
+import re
+from collections import Counter
+import metrics
+
+NORMALIZE_TEXT = os.getenv("NORMALIZE_TEXT", "1") == "1"
+EDGE_LINES = 2  # non-empty lines at the top and at the bottom of a page that may be a header or footer
+REPEAT_MIN_PAGES = 3  # a header or footer has to appear on at least this many pages
+REPEAT_MIN_SHARE = 0.5  # ... and on at least this share of all pages
+CHARS_PER_TOKEN = 4  # the rough estimate rate_limiter budgets with
+
+PAGE_MARKER = re.compile(r"^-{2,}\s*page\s+\d+\s*-{2,}$", re.IGNORECASE)  # "--- Page 3 ---"
+# "12", "- 12 -", "[12]", "Page 12", "12 of 40", "12/40"
+PAGE_NUMBER = re.compile(r"^(page\s*)?[-–—(\[]?\s*\d{1,4}\s*[-–—)\]]?(\s*(of|/)\s*\d{1,4})?$", re.IGNORECASE)
+HYPHENATED = re.compile(r"([^\W\d_])-\n(?=[^\W\d_A-Z])")  # "photo-\nsynthesis", but not "Class-\n10" or "Jean-\nPaul"
+SPACES = re.compile(r"[ \t ]+")
+BLANK_LINES = re.compile(r"\n{3,}")
+DIGITS = re.compile(r"\d+")
+
+CHARS = metrics.counter("normalization_chars_total", "Characters of extracted text before normalization and removed by it", ["kind"])
+
+def line_key(line):
+    # the page number in a running header changes from page to page, so digits do not count
+    return DIGITS.sub("#", SPACES.sub(" ", line.strip().lower()))
+
+def edge_indices(lines):
+    # indices of the first and last EDGE_LINES non-empty lines
+    filled = [index for index, line in enumerate(lines) if line.strip()]
+    return set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+
+def repeated_lines(pages_lines):
+    # keys of the edge lines that come back on enough pages to be running headers or footers
+    counts = Counter()
+    for lines in pages_lines:
+        counts.update({line_key(lines[index]) for index in edge_indices(lines)})
+    threshold = max(REPEAT_MIN_PAGES, math.ceil(len(pages_lines) * REPEAT_MIN_SHARE))
+    return {key for key, count in counts.items() if count >= threshold}
+
+def clean_page(lines, repeated):
+    edges = edge_indices(lines)
+    kept = []
+    for index, line in enumerate(lines):
+        stripped = SPACES.sub(" ", line.strip())
+        if PAGE_MARKER.match(stripped):
+            continue
+        if index in edges and (PAGE_NUMBER.match(stripped) or line_key(stripped) in repeated):
+            continue
+        kept.append(stripped)
+    text = HYPHENATED.sub(r"\1", "\n".join(kept))
+    return BLANK_LINES.sub("\n\n", text).strip()
+
+def normalize_pages(texts):
+    """
+        Remove running headers/footers, page numbers and "--- Page N ---" markers, join words
+        hyphenated across line breaks and collapse whitespace. Does nothing if NORMALIZE_TEXT is 0
+
+        Input:
+        texts - list of page texts, in page order
+
+        Output:
+        texts - list of cleaned page texts, same length
+        stats - dict with chars_before, chars_after, chars_saved, tokens_saved and repeated_lines
+    """
+    chars_before = sum(len(text) for text in texts)
+    if NORMALIZE_TEXT:
+        pages_lines = [text.split("\n") for text in texts]
+        repeated = repeated_lines(pages_lines)
+        texts = [clean_page(lines, repeated) for lines in pages_lines]
+    else:
+        repeated = set()
+    chars_after = sum(len(text) for text in texts)
+    saved = chars_before - chars_after
+
+    CHARS.inc(chars_before, kind="input")
+    CHARS.inc(saved, kind="removed")
+    return texts, {
+        "chars_before": chars_before,
+        "chars_after": chars_after,
+        "chars_saved": saved,
+        "tokens_saved": saved // CHARS_PER_TOKEN,
+        "repeated_lines": len(repeated),
+    }
@@ -0,0 +1,183 @@
+# Background audio synthesis - every summary gets its own WAV file and the HTTP response does not wait for it
+
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+AUDIO_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'audio')
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 2))
+TTS_MAX_FILES = int(os.getenv("TTS_MAX_FILES", 200))  # older audio files are deleted beyond this
+STALE_PART_SECONDS = 3600  # a .part file this old was left behind by a crashed synthesis
+
+os.makedirs(AUDIO_FOLDER, exist_ok=True)
+executor = None  # started on the first job, processes that only import this module (e.g. OCR workers) never need it
+executor_lock = threading.Lock()
+# job id -> {"status", "text", "voice", "error", "pieces", "ready"}, oldest first. While the job runs, "pieces"
+# holds the PCM written so far for streams to follow, "ready" is notified whenever it grows or the job ends
+jobs = OrderedDict()
+jobs_lock = threading.Lock()
+
+TTS_SECONDS = metrics.histogram("tts_seconds", "Time to synthesize a summary", ["status"])
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+    return executor
+
+def audio_path(job_id):
+    return os.path.join(AUDIO_FOLDER, f"{job_id}.wav")
+
+def submit(voice, text):
+    """
+        Queue synthesis of text with a Piper voice
+
+        Input:
+        voice - PiperVoice
+        text - plain text to read out
+
+        Output:
+        job id - string
+    """
+    job_id = uuid.uuid4().hex
+    with jobs_lock:
+        jobs[job_id] = {"status": "queued", "text": text, "voice": voice, "error": None,
+                        "pieces": [], "ready": threading.Condition()}
+        remove_old_jobs()
+    get_executor().submit(run, job_id)
+    return job_id
+
+def finish(job, status, error=None):
+    # wakes up the streams following the job; they keep their own reference to the pieces
+    with job["ready"]:
+        job["status"] = status
+        job["error"] = error
+        job["pieces"] = None
+        job["ready"].notify_all()
+
+def run(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return
+        job["status"] = "running"
+    # write next to the final file and rename at the end, so a finished file is never partial
+    tmp_path = audio_path(job_id) + ".part"
+    pieces, ready = job["pieces"], job["ready"]
+    try:
+        with metrics.timed(TTS_SECONDS), wave.open(tmp_path, "wb") as wav_file:
+            # the one synthesis of the job, a stream of it follows the pieces instead of synthesizing again
+            for number, audio_chunk in enumerate(job["voice"].synthesize(job["text"])):
+                if number == 0:
+                    wav_file.setframerate(audio_chunk.sample_rate)
+                    wav_file.setsampwidth(audio_chunk.sample_width)
+                    wav_file.setnchannels(audio_chunk.sample_channels)
+                wav_file.writeframes(audio_chunk.audio_int16_bytes)
+                with ready:
+                    pieces.append(audio_chunk.audio_int16_bytes)
+                    ready.notify_all()
+        os.replace(tmp_path, audio_path(job_id))
+        finish(job, "done")
+        remove_old_files()
+    except Exception as e:
+        print(f"[WARN] Audio synthesis failed for {job_id}: {e}")
+        finish(job, "error", str(e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def status(job_id):
+    # None if the job is unknown
+    if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+        return None
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is not None:
+            return {"status": job["status"], "error": job["error"]}
+    # finished by another worker process, or before a restart
+    if os.path.exists(audio_path(job_id)):
+        return {"status": "done", "error": None}
+    return None
+
+def remove_old_jobs():
+    # caller holds jobs_lock; forgets finished jobs beyond TTS_MAX_FILES, their files are left to remove_old_files
+    finished = [job_id for job_id, job in jobs.items() if job["status"] in ("done", "error")]
+    for job_id in finished[:max(0, len(jobs) - TTS_MAX_FILES)]:
+        del jobs[job_id]
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # removed by another process
+
+def remove_old_files():
+    # keeps the newest TTS_MAX_FILES audio files in AUDIO_FOLDER, by mtime like DiskCache.evict, so files
+    # of earlier runs and of other worker processes are removed too
+    now = time.time()
+    files = []
+    for name in os.listdir(AUDIO_FOLDER):
+        path = os.path.join(AUDIO_FOLDER, name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        if name.endswith(".wav"):
+            files.append((mtime, path))
+        elif name.endswith(".part") and now - mtime > STALE_PART_SECONDS:
+            remove_file(path)
+    files.sort(reverse=True)
+    for _, path in files[TTS_MAX_FILES:]:
+        remove_file(path)
+
+def wav_header(sample_rate, sample_width=2, channels=1):
+    # header for a WAV of unknown length, players read until the stream ends
+    unknown = 0xFFFFFFFF
+    return (b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate,
+                                    sample_rate * channels * sample_width, channels * sample_width, sample_width * 8)
+            + b"data" + struct.pack("<I", unknown))
+
+def stream(job_id):
+    """
+        Follow the audio of a queued or running job as it is synthesized, so playback can start
+        after the first sentence
+
+        Input:
+        job_id - string
+
+        Output:
+        generator of WAV bytes (header, then 16-bit PCM), or None if the job has ended
+        or is not known to this process
+    """
+    with jobs_lock:
+        job = jobs.get(job_id)
+    if job is None:
+        return None
+    ready = job["ready"]
+    with ready:
+        pieces = job["pieces"]
+    if pieces is None:
+        return None
+
+    def chunks():
+        yield wav_header(job["voice"].config.sample_rate)
+        sent = 0
+        while True:
+            with ready:
+                ready.wait_for(lambda: len(pieces) > sent or job["pieces"] is None)
+                new = pieces[sent:]
+                ended = job["pieces"] is None
+            yield from new
+            sent += len(new)
+            if ended and not new:
+                return  # after an error the audio just stops, the status endpoint has the error
+
+    return chunks()